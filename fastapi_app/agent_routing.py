@@ -0,0 +1,163 @@
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, List, Dict, Any, Set, Awaitable
+from database import execute_query, get_supabase_client, phone_lookup_key
+from change_feed import on_change, on_reset
+
+logger = logging.getLogger(__name__)
+
+# Full reload interval of the in-memory phone number -> agent routing table
+AGENT_ROUTING_REFRESH_SECONDS = float(os.getenv("AGENT_ROUTING_REFRESH_SECONDS", "60"))
+
+# Agent columns returned by /agents/by-number
+AGENT_ROUTE_COLUMNS = [
+    "id", "name", "voice", "status", "description", "conversations", "last_active", "system_prompt",
+    "first_message", "knowledge_base_id", "created_at", "updated_at"
+]
+
+# Rows per page when loading the routing table
+_PAGE_SIZE = 1000
+
+_SELECT = f"id, agent_id, phone_normalized, agents!inner({', '.join(AGENT_ROUTE_COLUMNS)})"
+
+class AgentRoutingTable:
+    """Normalized phone number -> agent, held in memory so call routing needs no database round trip"""
+    
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Refreshes started by change feed events, referenced until they finish
+        self._refreshes: Set[asyncio.Task] = set()
+        self.loaded_at: Optional[float] = None
+        self.loads = 0
+    
+    async def load(self, supabase) -> int:
+        """Rebuild the whole table from agent_phone_numbers and swap it in"""
+        routes: Dict[str, Dict[str, Any]] = {}
+        last_id = None
+        while True:
+            query = supabase.table("agent_phone_numbers").select(_SELECT)
+            if last_id:
+                query = query.gt("id", last_id)
+            result = await execute_query(query.order("id").limit(_PAGE_SIZE))
+            rows = result.data or []
+            for row in rows:
+                routes[row["phone_normalized"]] = row["agents"]
+            if len(rows) < _PAGE_SIZE:
+                break
+            last_id = rows[-1]["id"]
+        
+        self._routes = routes
+        self.loaded_at = time.time()
+        self.loads += 1
+        return len(routes)
+    
+    async def ensure_loaded(self, supabase) -> None:
+        """Load the table once if the background refresh has not done so yet"""
+        if self.loaded_at is not None:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self.loaded_at is None:
+                await self.load(supabase)
+    
+    def lookup(self, number: str) -> Optional[Dict[str, Any]]:
+        lookup_key = phone_lookup_key(number)
+        return self._routes.get(lookup_key) if lookup_key else None
+    
+    async def refresh_agent(self, supabase, agent_id: str) -> None:
+        """Reload the numbers and details of one agent after it or its numbers changed"""
+        result = await execute_query(supabase.table("agent_phone_numbers").select(_SELECT).eq("agent_id", agent_id))
+        routes = {key: agent for key, agent in self._routes.items() if agent["id"] != agent_id}
+        for row in result.data or []:
+            routes[row["phone_normalized"]] = row["agents"]
+        self._routes = routes
+    
+    def remove_number(self, number: str) -> None:
+        lookup_key = phone_lookup_key(number)
+        if lookup_key in self._routes:
+            self._routes = {key: agent for key, agent in self._routes.items() if key != lookup_key}
+    
+    def _schedule(self, refresh: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(refresh)
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+    
+    def on_agent_change(self, event: Dict[str, Any]) -> None:
+        """Reload an agent's routes when the agent or one of its numbers changed in another worker or the dashboard"""
+        agent_ids = {event.get("agent_id"), event.get("old_agent_id")} if event["table"] == "agent_phone_numbers" else {event["id"]}
+        supabase = get_supabase_client(use_service_role=True)
+        for agent_id in agent_ids - {None}:
+            self._schedule(self.refresh_agent(supabase, agent_id))
+    
+    def on_reset(self) -> None:
+        if self.loaded_at is not None:
+            self._schedule(self.load(get_supabase_client(use_service_role=True)))
+    
+    async def _run(self) -> None:
+        supabase = get_supabase_client(use_service_role=True)
+        while True:
+            try:
+                # The first pass shares the lock with requests that arrive before the initial load finished
+                if self.loaded_at is None:
+                    await self.ensure_loaded(supabase)
+                else:
+                    await self.load(supabase)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Agent routing table refresh failed: %s", e)
+            await asyncio.sleep(AGENT_ROUTING_REFRESH_SECONDS)
+    
+    def start(self) -> None:
+        """Load the table now and reload it periodically to pick up changes made outside the API"""
+        self._worker = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "numbers": len(self._routes),
+            "agents": len({agent["id"] for agent in self._routes.values()}),
+            "loaded_at": self.loaded_at,
+            "loads": self.loads,
+            "refresh_seconds": AGENT_ROUTING_REFRESH_SECONDS
+        }
+
+agent_routing = AgentRoutingTable()
+
+on_change("agents", agent_routing.on_agent_change)
+on_change("agent_phone_numbers", agent_routing.on_agent_change)
+on_reset(agent_routing.on_reset)
+
+def normalize_phone_numbers(phone_numbers: List[str]) -> List[Dict[str, str]]:
+    """Deduplicated phone_number / phone_normalized pairs; raises ValueError for numbers that are empty after normalization"""
+    numbers = []
+    for phone_number in dict.fromkeys(phone_numbers):
+        lookup_key = phone_lookup_key(phone_number)
+        if not lookup_key:
+            raise ValueError(f"Invalid phone number: {phone_number!r}")
+        numbers.append({"phone_number": phone_number, "phone_normalized": lookup_key})
+    return numbers
+
+async def assign_phone_numbers(supabase, agent: Dict[str, Any], phone_numbers: List[str]) -> List[Dict[str, Any]]:
+    """Route phone numbers to an agent; raises ValueError for numbers that are empty after normalization"""
+    rows = [{"agent_id": agent["id"], "user_id": agent["user_id"], **number} for number in normalize_phone_numbers(phone_numbers)]
+    if not rows:
+        return []
+    
+    result = await execute_query(supabase.table("agent_phone_numbers").insert(rows))
+    await agent_routing.refresh_agent(get_supabase_client(use_service_role=True), agent["id"])
+    return result.data or []
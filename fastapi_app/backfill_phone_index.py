@@ -0,0 +1,41 @@
+"""Backfill contacts.phone_normalized for rows created before the column existed.
+
+Usage:
+    python backfill_phone_index.py [--batch-size 500]
+"""
+import argparse
+from database import get_supabase_client, phone_lookup_key
+
+def backfill(batch_size: int = 500) -> int:
+    """Populate phone_normalized in batches, returning the number of rows updated"""
+    supabase = get_supabase_client(use_service_role=True)
+    updated = 0
+    last_id = None
+    
+    while True:
+        query = supabase.table("contacts").select("id, phone").is_("phone_normalized", "null").not_.is_("phone", "null")
+        if last_id:
+            query = query.gt("id", last_id)
+        result = query.order("id").limit(batch_size).execute()
+        
+        rows = result.data or []
+        if not rows:
+            break
+        
+        for row in rows:
+            lookup_key = phone_lookup_key(row["phone"])
+            if lookup_key:
+                supabase.table("contacts").update({"phone_normalized": lookup_key}).eq("id", row["id"]).execute()
+                updated += 1
+        
+        # Rows whose phone normalizes to nothing stay NULL, so page by id
+        last_id = rows[-1]["id"]
+        print(f"Backfilled {updated} contacts")
+    
+    return updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill contacts.phone_normalized")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    backfill(args.batch_size)
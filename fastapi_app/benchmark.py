@@ -0,0 +1,360 @@
+"""Reproducible benchmark of the API's hot paths.
+
+By default the app runs in-process against FakePostgrest, an in-memory stand-in
+for the Supabase REST API, so the benchmark needs no network or database. Every
+id, phone number and API key is derived from a fixed seed, so runs at the same
+scale are comparable and each run writes a JSON results file.
+
+Scenarios: inbound ring (caller-details), call-data ingestion, the contacts and
+agents list endpoints, the extracted-data export and campaign stats.
+
+Usage:
+    python benchmark.py --contacts 50000 --calls 100000 --duration 10
+    python benchmark.py --db-latency-ms 2 --compare benchmark_results/previous.json
+
+For production-sized data (e.g. 1M contacts, 10M calls), seed a local Supabase
+that has the migrations applied (`supabase start`), run the app against it and
+point the benchmark at the app:
+    python benchmark.py seed-sql --contacts 1000000 --calls 10000000 | psql "$DATABASE_URL"
+    python benchmark.py --base-url http://localhost:8000 --contacts 1000000 --calls 10000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
+import httpx
+from load_test import percentile
+
+# Namespace for the deterministic ids; seed-sql derives the same ids with uuid_generate_v5
+BENCH_NAMESPACE = uuid.UUID("6f1c3a52-8d0e-4c1b-9a57-3e2d5b7c9f10")
+EPOCH = datetime(2026, 1, 1)
+EXTRACTED_FIELDS = ["interested", "budget", "callback_time"]
+
+def bench_id(kind: str, number: int) -> str:
+    return str(uuid.uuid5(BENCH_NAMESPACE, f"{kind}-{number}"))
+
+def api_key(user: int) -> str:
+    return f"dhwani_bench_{user}"
+
+def contact_phone(contact: int) -> str:
+    return f"+1555{contact:07d}"
+
+def contact_user(contact: int, users: int) -> int:
+    return contact % users
+
+def _timestamp(seconds: int) -> str:
+    return (EPOCH + timedelta(seconds=seconds)).isoformat() + "+00:00"
+
+def dataset(users: int, contacts: int, calls: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(table, row) pairs for the benchmark data set"""
+    for user in range(users):
+        user_id = bench_id("user", user)
+        yield "profiles", {"id": user_id, "email": f"bench{user}@example.com", "full_name": f"Bench User {user}"}
+        yield "user_settings", {"user_id": user_id, "setting_key": "api_key", "setting_value": api_key(user)}
+        yield "knowledge_base", {
+            "id": bench_id("knowledge_base", user), "user_id": user_id, "title": "Product FAQ", "type": "document",
+            "status": "published", "content": "Returns are accepted within 30 days. " * 50
+        }
+        yield "scripts", {"id": bench_id("script", user), "user_id": user_id, "name": "Default script", "first_message": "Hello!"}
+        for agent in range(5):
+            yield "agents", {
+                "id": bench_id("agent", user * 5 + agent), "user_id": user_id, "name": f"Agent {agent}", "voice": "nova",
+                "status": "active", "system_prompt": "You are a helpful calling agent. " * 20, "conversations": 0
+            }
+        for campaign_type in ["inbound", "outbound"]:
+            yield "campaigns", {
+                "id": bench_id(f"{campaign_type}_campaign", user), "user_id": user_id, "name": f"{campaign_type.title()} campaign",
+                "status": "active", "campaign_type": campaign_type, "settings": {"campaign_type": campaign_type},
+                "agent_id": bench_id("agent", user * 5), "script_id": bench_id("script", user),
+                "knowledge_base_id": bench_id("knowledge_base", user),
+                "extracted_data_config": [{"name": name} for name in EXTRACTED_FIELDS]
+            }
+    
+    for contact in range(contacts):
+        phone = contact_phone(contact)
+        yield "contacts", {
+            "id": bench_id("contact", contact), "user_id": bench_id("user", contact_user(contact, users)),
+            "name": f"Contact {contact}", "phone": phone, "phone_normalized": phone,
+            "email": f"contact{contact}@example.com", "city": "Springfield", "state": "IL", "status": "active",
+            "created_at": _timestamp(contact * 60), "updated_at": _timestamp(contact * 60)
+        }
+    
+    for call in range(calls):
+        contact = call % contacts
+        user = contact_user(contact, users)
+        yield "calls", {
+            "id": bench_id("call", call), "user_id": bench_id("user", user), "contact_id": bench_id("contact", contact),
+            "campaign_id": bench_id("outbound_campaign", user), "phone": contact_phone(contact), "status": "completed",
+            "direction": "outbound", "duration": 30 + call % 600, "started_at": _timestamp(call * 30),
+            "extracted_data": {"interested": call % 3 == 0, "budget": (call % 10) * 1000, "callback_time": None},
+            "created_at": _timestamp(call * 30), "updated_at": _timestamp(call * 30)
+        }
+    
+    # FakePostgrest has no triggers, so build the rollups the calls trigger maintains in Postgres
+    from campaign_stats import duration_bucket
+    rollups: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for call in range(calls):
+        user = contact_user(call % contacts, users)
+        day = _timestamp(call * 30)[:10]
+        rollup = rollups.setdefault((user, day), {
+            "id": bench_id("campaign_call_stats", len(rollups)), "campaign_id": bench_id("outbound_campaign", user),
+            "agent_id": bench_id("agent", user * 5), "day": day, "user_id": bench_id("user", user), "calls": 0,
+            "status_counts": {}, "outcome_counts": {}, "sentiment_count": 0, "sentiment_sum": 0.0, "objective_known_count": 0,
+            "objective_met_count": 0, "duration_count": 0, "duration_sum": 0, "duration_sketch": {}
+        })
+        duration = 30 + call % 600
+        bucket = str(duration_bucket(duration))
+        rollup["calls"] += 1
+        rollup["status_counts"]["completed"] = rollup["status_counts"].get("completed", 0) + 1
+        rollup["duration_count"] += 1
+        rollup["duration_sum"] += duration
+        rollup["duration_sketch"][bucket] = rollup["duration_sketch"].get(bucket, 0) + 1
+    for rollup in rollups.values():
+        yield "campaign_call_stats", rollup
+
+def seed_sql(users: int, contacts: int, calls: int) -> str:
+    """SQL that loads the same data set into a Postgres with the repo's migrations applied"""
+    def v5(kind: str, number: str) -> str:
+        return f"extensions.uuid_generate_v5('{BENCH_NAMESPACE}', '{kind}-' || ({number}))"
+    
+    def ts(seconds: str) -> str:
+        return f"(timestamptz '{EPOCH.isoformat()}+00:00' + ({seconds}) * interval '1 second')"
+    
+    return f"""-- Benchmark data set: {users} users, {contacts} contacts, {calls} calls
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp" WITH SCHEMA extensions;
+BEGIN;
+INSERT INTO auth.users (id, instance_id, aud, role, email)
+SELECT {v5('user', 'u')}, '00000000-0000-0000-0000-000000000000', 'authenticated', 'authenticated', 'bench' || u || '@example.com'
+FROM generate_series(0, {users - 1}) u ON CONFLICT DO NOTHING;
+INSERT INTO public.profiles (id, email, full_name)
+SELECT {v5('user', 'u')}, 'bench' || u || '@example.com', 'Bench User ' || u
+FROM generate_series(0, {users - 1}) u ON CONFLICT (id) DO NOTHING;
+INSERT INTO public.user_settings (user_id, setting_key, setting_value)
+SELECT {v5('user', 'u')}, 'api_key', 'dhwani_bench_' || u FROM generate_series(0, {users - 1}) u;
+INSERT INTO public.knowledge_base (id, user_id, title, type, status, content)
+SELECT {v5('knowledge_base', 'u')}, {v5('user', 'u')}, 'Product FAQ', 'document', 'published', repeat('Returns are accepted within 30 days. ', 50)
+FROM generate_series(0, {users - 1}) u;
+INSERT INTO public.scripts (id, user_id, name, first_message)
+SELECT {v5('script', 'u')}, {v5('user', 'u')}, 'Default script', 'Hello!' FROM generate_series(0, {users - 1}) u;
+INSERT INTO public.agents (id, user_id, name, voice, status, system_prompt, conversations)
+SELECT {v5('agent', 'u * 5 + a')}, {v5('user', 'u')}, 'Agent ' || a, 'nova', 'active', repeat('You are a helpful calling agent. ', 20), 0
+FROM generate_series(0, {users - 1}) u, generate_series(0, 4) a;
+INSERT INTO public.campaigns (id, user_id, name, status, settings, agent_id, script_id, knowledge_base_id, extracted_data_config)
+SELECT {v5("' || t || '_campaign", 'u')}, {v5('user', 'u')}, initcap(t) || ' campaign', 'active', jsonb_build_object('campaign_type', t),
+  {v5('agent', 'u * 5')}, {v5('script', 'u')}, {v5('knowledge_base', 'u')},
+  '[{{"name": "interested"}}, {{"name": "budget"}}, {{"name": "callback_time"}}]'::jsonb
+FROM generate_series(0, {users - 1}) u, unnest(ARRAY['inbound', 'outbound']) t;
+INSERT INTO public.contacts (id, user_id, name, phone, phone_normalized, email, city, state, status, created_at, updated_at)
+SELECT {v5('contact', 'c')}, {v5('user', f'c % {users}')}, 'Contact ' || c, '+1555' || lpad(c::text, 7, '0'), '+1555' || lpad(c::text, 7, '0'),
+  'contact' || c || '@example.com', 'Springfield', 'IL', 'active', {ts('c * 60')}, {ts('c * 60')}
+FROM generate_series(0, {contacts - 1}) c;
+INSERT INTO public.calls (id, user_id, contact_id, campaign_id, phone, status, direction, duration, started_at, extracted_data, created_at, updated_at)
+SELECT {v5('call', 'k')}, {v5('user', f'(k % {contacts}) % {users}')}, {v5('contact', f'k % {contacts}')},
+  {v5('outbound_campaign', f'(k % {contacts}) % {users}')}, '+1555' || lpad((k % {contacts})::text, 7, '0'), 'completed', 'outbound',
+  30 + k % 600, {ts('k * 30')}, jsonb_build_object('interested', k % 3 = 0, 'budget', (k % 10) * 1000, 'callback_time', null),
+  {ts('k * 30')}, {ts('k * 30')}
+FROM generate_series(0, {calls - 1}) k;
+COMMIT;
+ANALYZE;
+"""
+
+class Scenario:
+    """A request generator run in a closed loop at a fixed concurrency"""
+    
+    def __init__(self, name: str, concurrency: int, build: Callable[[random.Random], Dict[str, Any]]):
+        self.name = name
+        self.concurrency = concurrency
+        self.build = build
+
+def scenarios(users: int, contacts: int, concurrency: int) -> List[Scenario]:
+    call_numbers = iter(range(10 ** 12))
+    
+    def auth(user: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {api_key(user)}"}
+    
+    def inbound_ring(rng: random.Random) -> Dict[str, Any]:
+        return {"method": "GET", "url": "/call-details/caller-details", "params": {"phone": contact_phone(rng.randrange(contacts))}}
+    
+    def call_ingest(rng: random.Random) -> Dict[str, Any]:
+        contact = rng.randrange(contacts)
+        return {"method": "POST", "url": "/call-data/receive-call-data", "json": {
+            "phone": contact_phone(contact),
+            "call_id": f"bench-{os.getpid()}-{next(call_numbers)}",
+            "campaign_id": bench_id("outbound_campaign", contact_user(contact, users)),
+            "status": "completed",
+            "duration": rng.randrange(30, 600),
+            "transcript": "Agent: Hello! Caller: Hi, I am interested. " * 10,
+            "extracted_data": {"interested": True, "budget": rng.randrange(10) * 1000}
+        }}
+    
+    def contacts_list(rng: random.Random) -> Dict[str, Any]:
+        return {"method": "GET", "url": "/contacts/list", "headers": auth(rng.randrange(users))}
+    
+    def agents_list(rng: random.Random) -> Dict[str, Any]:
+        return {"method": "GET", "url": "/agents/list", "headers": auth(rng.randrange(users))}
+    
+    def extracted_export(rng: random.Random) -> Dict[str, Any]:
+        return {"method": "GET", "url": f"/campaigns/extracted-data/{bench_id('outbound_campaign', rng.randrange(users))}", "params": {"format": "ndjson"}}
+    
+    def campaign_stats(rng: random.Random) -> Dict[str, Any]:
+        user = rng.randrange(users)
+        return {"method": "GET", "url": f"/campaigns/{bench_id('outbound_campaign', user)}/stats", "headers": auth(user)}
+    
+    return [
+        Scenario("inbound_ring", concurrency, inbound_ring),
+        Scenario("call_ingest", concurrency, call_ingest),
+        Scenario("contacts_list", concurrency, contacts_list),
+        Scenario("agents_list", concurrency, agents_list),
+        # Exports are long requests that few clients run at once
+        Scenario("extracted_export", max(1, concurrency // 10), extracted_export),
+        Scenario("campaign_stats", concurrency, campaign_stats)
+    ]
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, duration: float, seed: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    bytes_received = 0
+    deadline = time.perf_counter() + duration
+    
+    async def worker(rng: random.Random):
+        nonlocal errors, bytes_received
+        while time.perf_counter() < deadline:
+            request = scenario.build(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                bytes_received += response.num_bytes_downloaded
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed * 1000 + index)) for index in range(scenario.concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    return {
+        "scenario": scenario.name,
+        "concurrency": scenario.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "bytes_per_response": round(bytes_received / len(latencies)) if latencies else 0
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def in_process_client(args: argparse.Namespace) -> httpx.AsyncClient:
+    """Load the data set into FakePostgrest and serve the app through an ASGI transport"""
+    # supabase-py only checks that a key is present; nothing leaves the process
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.benchmark")
+    import database
+    from fake_postgrest import FakePostgrest
+    
+    fake = FakePostgrest(latency_ms=args.db_latency_ms)
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for table, row in dataset(args.users, args.contacts, args.calls):
+        rows.setdefault(table, []).append(row)
+    for table, table_rows in rows.items():
+        fake.insert(table, table_rows)
+    
+    database._transport = fake.transport()
+    database.init_supabase_clients()
+    import main
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=120)
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {result["scenario"]: result for result in json.load(f)["scenarios"]}
+    print(f"\nChange vs {baseline_path}")
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if not previous:
+            continue
+        changes = [
+            f"{metric} {((result[metric] - previous[metric]) / previous[metric] * 100):+.1f}%"
+            for metric in ["throughput", "p50_ms", "p99_ms"] if previous[metric]
+        ]
+        print(f"{result['scenario']:>18}  " + "  ".join(changes))
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    client = httpx.AsyncClient(base_url=args.base_url, timeout=120) if args.base_url else in_process_client(args)
+    results = []
+    async with client:
+        print(f"{'scenario':>18} {'conc':>5} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for scenario in scenarios(args.users, args.contacts, args.concurrency):
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            if args.warmup:
+                await run_scenario(client, scenario, args.warmup, args.seed + 1)
+            result = await run_scenario(client, scenario, args.duration, args.seed)
+            results.append(result)
+            print(
+                f"{result['scenario']:>18} {result['concurrency']:>5} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['throughput']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+            )
+    
+    report = {
+        "run": {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "target": args.base_url or "in-process",
+            "users": args.users,
+            "contacts": args.contacts,
+            "calls": args.calls,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "db_latency_ms": None if args.base_url else args.db_latency_ms
+        },
+        "scenarios": results
+    }
+    output = args.output or os.path.join("benchmark_results", datetime.utcnow().strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    
+    if args.compare:
+        print_comparison(results, args.compare)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API against a seeded data set")
+    parser.add_argument("command", nargs="?", choices=["run", "seed-sql"], default="run")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=50000)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unrecorded seconds before each scenario")
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="Simulated round-trip time of the in-process database")
+    parser.add_argument("--base-url", default=None, help="Benchmark a running app instead of an in-process one")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=None, help="Comma-separated subset to run")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+    
+    if args.command == "seed-sql":
+        print(seed_sql(args.users, args.contacts, args.calls))
+    else:
+        asyncio.run(run(args))
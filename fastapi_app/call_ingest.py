@@ -0,0 +1,228 @@
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Union
+from pydantic import BaseModel
+from postgrest.exceptions import APIError
+from database import get_supabase_client, execute_query, find_contacts_by_phones, phone_lookup_key, invalidate_contact_phone
+from dial_queue import reschedule_campaign_contacts
+from transcript_store import store_transcripts
+
+logger = logging.getLogger(__name__)
+
+# Optional in-process buffer that coalesces single call-data posts into batch writes
+CALL_DATA_BUFFER_ENABLED = os.getenv("CALL_DATA_BUFFER_ENABLED", "false").lower() == "true"
+CALL_DATA_BUFFER_MAX_SIZE = int(os.getenv("CALL_DATA_BUFFER_MAX_SIZE", "500"))
+CALL_DATA_BUFFER_MAX_DELAY_MS = float(os.getenv("CALL_DATA_BUFFER_MAX_DELAY_MS", "50"))
+
+class CallData(BaseModel):
+    phone: str
+    duration: Optional[int] = None
+    status: Optional[str] = None
+    direction: Optional[str] = "outbound"
+    recording_url: Optional[str] = None
+    transcript: Optional[str] = None
+    call_id: Optional[str] = None
+    started_at: Optional[str] = None
+    ended_at: Optional[str] = None
+    notes: Optional[str] = None
+    campaign_id: Optional[str] = None
+    outcome: Optional[str] = None
+    sentiment: Optional[float] = None
+    user_id: Optional[str] = None
+    extracted_data: Optional[Dict[str, Any]] = None
+    call_status: Optional[str] = "completed"
+    rescheduled_for: Optional[str] = None
+    objective_met: Optional[bool] = None
+
+def build_call_record(call_data: CallData, contact: Dict[str, Any], now: str, transcript_columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Row for the calls table; transcript_columns come from offload_transcript"""
+    return {
+        "contact_id": contact["id"],
+        "campaign_id": call_data.campaign_id,
+        "phone": call_data.phone,
+        "duration": call_data.duration,
+        "status": call_data.status or "unknown",
+        "direction": call_data.direction,
+        "recording_url": call_data.recording_url,
+        **transcript_columns,
+        "external_call_id": call_data.call_id,
+        "started_at": call_data.started_at or now,
+        "ended_at": call_data.ended_at,
+        "notes": call_data.notes,
+        "outcome": call_data.outcome,
+        "sentiment": call_data.sentiment,
+        "user_id": call_data.user_id or contact["user_id"],
+        "extracted_data": call_data.extracted_data,
+        "call_status": call_data.call_status,
+        "rescheduled_for": call_data.rescheduled_for,
+        "objective_met": call_data.objective_met,
+        "created_at": now,
+        "updated_at": now
+    }
+
+async def _insert_call_records(supabase, records: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+    """Insert call rows in one statement; if it is rejected, insert them one by one so only the offending rows fail"""
+    try:
+        # PostgREST returns inserted rows in request order
+        return (await execute_query(supabase.table("calls").insert(records))).data
+    except APIError as e:
+        if len(records) == 1:
+            return [e]
+    
+    async def insert_one(record: Dict[str, Any]) -> Union[Dict[str, Any], Exception]:
+        try:
+            return (await execute_query(supabase.table("calls").insert(record))).data[0]
+        except APIError as e:
+            return e
+    
+    return await asyncio.gather(*(insert_one(record) for record in records))
+
+async def _update_called_contacts(supabase, stored: List[tuple], now: str) -> None:
+    """Set last_called once per contact and requeue callbacks, for calls that were stored"""
+    last_called: Dict[str, str] = {}
+    for _, call_data, contact in stored:
+        called_at = call_data.ended_at or call_data.started_at or now
+        last_called[contact["id"]] = max(last_called.get(contact["id"], called_at), called_at)
+    
+    # Group contacts that share a value into one update
+    contact_ids_by_value: Dict[str, List[str]] = {}
+    for contact_id, value in last_called.items():
+        contact_ids_by_value.setdefault(value, []).append(contact_id)
+    # Calls that asked for a callback put the contact back on its campaign's dial queue
+    rescheduled = [
+        {"campaign_id": call_data.campaign_id, "contact_id": contact["id"], "rescheduled_for": call_data.rescheduled_for}
+        for _, call_data, contact in stored if call_data.campaign_id and call_data.rescheduled_for
+    ]
+    await asyncio.gather(
+        *(
+            execute_query(supabase.table("contacts").update({"last_called": value, "updated_at": now}).in_("id", contact_ids))
+            for value, contact_ids in contact_ids_by_value.items()
+        ),
+        reschedule_campaign_contacts(supabase, rescheduled)
+    )
+    for _, call_data, _ in stored:
+        invalidate_contact_phone(call_data.phone)
+
+async def ingest_calls(supabase, calls: List[CallData]) -> List[Dict[str, Any]]:
+    """Store a batch of call results: one contact lookup, one multi-row insert and one last_called update per contact"""
+    now = datetime.utcnow().isoformat()
+    contacts = await find_contacts_by_phones(supabase, [call_data.phone for call_data in calls])
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+    matched = []
+    for index, call_data in enumerate(calls):
+        contact = contacts.get(phone_lookup_key(call_data.phone))
+        if not contact:
+            results[index] = {"success": False, "status_code": 404, "error": "Contact not found"}
+            continue
+        matched.append((index, call_data, contact))
+    
+    if not matched:
+        return results
+    
+    # Long transcripts are written to the blob store before their rows reference them
+    transcript_columns = await store_transcripts([call_data.transcript for _, call_data, _ in matched])
+    inserted = await _insert_call_records(supabase, [
+        build_call_record(call_data, contact, now, columns)
+        for (_, call_data, contact), columns in zip(matched, transcript_columns)
+    ])
+    
+    stored = []
+    for (index, call_data, contact), call_row in zip(matched, inserted):
+        if isinstance(call_row, Exception):
+            results[index] = {"success": False, "status_code": 400, "error": call_row.message or str(call_row)}
+            continue
+        stored.append((index, call_data, contact))
+        results[index] = {
+            "success": True,
+            "message": "Call data received and stored successfully",
+            "campaign_id": call_data.campaign_id,
+            "contact": {
+                "id": contact["id"],
+                "name": contact["name"],
+                "phone": contact["phone"]
+            },
+            "call_id": call_row["id"]
+        }
+    
+    if stored:
+        try:
+            await _update_called_contacts(supabase, stored, now)
+        except Exception as e:
+            # The calls are stored; failing them here would make clients retry and store them twice
+            logger.warning("Could not update contacts after storing %d calls: %s", len(stored), e)
+    
+    return results
+
+class CallWriteBuffer:
+    """Collects single call-data posts and writes them with ingest_calls once the buffer is full or old enough"""
+    
+    def __init__(self, max_size: int, max_delay_ms: float):
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.flushes = 0
+        self.calls_written = 0
+    
+    async def submit(self, call_data: CallData) -> Dict[str, Any]:
+        """Queue a call and wait for the flush that writes it"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((call_data, future))
+        
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+        
+        return await future
+    
+    def _schedule_flush(self) -> None:
+        """Hand the pending calls to a background write"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            pending, self._pending = self._pending, []
+            asyncio.ensure_future(self._write(pending))
+    
+    async def _write(self, pending: List[tuple]) -> None:
+        """Write one group of buffered calls and resolve their waiters"""
+        try:
+            results = await ingest_calls(get_supabase_client(use_service_role=True), [call_data for call_data, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.flushes += 1
+        self.calls_written += len(pending)
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def flush(self) -> None:
+        """Write everything still buffered, e.g. at shutdown"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            pending, self._pending = self._pending, []
+            await self._write(pending)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Buffer size and flush counters"""
+        return {
+            "enabled": True,
+            "pending": len(self._pending),
+            "max_size": self.max_size,
+            "max_delay_ms": self.max_delay * 1000,
+            "flushes": self.flushes,
+            "calls_written": self.calls_written
+        }
+
+call_write_buffer = CallWriteBuffer(CALL_DATA_BUFFER_MAX_SIZE, CALL_DATA_BUFFER_MAX_DELAY_MS) if CALL_DATA_BUFFER_ENABLED else None
@@ -0,0 +1,263 @@
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any
+from database import get_supabase_client, execute_query
+from call_ingest import CallData, ingest_calls
+
+logger = logging.getLogger(__name__)
+
+# Local write-behind queue for call results (SQLite in WAL mode)
+CALL_QUEUE_PATH = os.getenv("CALL_QUEUE_PATH", "call_queue.sqlite3")
+CALL_QUEUE_MAX_PENDING = int(os.getenv("CALL_QUEUE_MAX_PENDING", "100000"))
+CALL_QUEUE_BATCH_SIZE = int(os.getenv("CALL_QUEUE_BATCH_SIZE", "200"))
+CALL_QUEUE_MAX_ATTEMPTS = int(os.getenv("CALL_QUEUE_MAX_ATTEMPTS", "8"))
+CALL_QUEUE_POLL_INTERVAL_MS = float(os.getenv("CALL_QUEUE_POLL_INTERVAL_MS", "200"))
+CALL_QUEUE_LEASE_SECONDS = float(os.getenv("CALL_QUEUE_LEASE_SECONDS", "120"))
+CALL_QUEUE_MAX_BACKOFF_SECONDS = float(os.getenv("CALL_QUEUE_MAX_BACKOFF_SECONDS", "300"))
+
+class QueueFullError(Exception):
+    """Raised when the queue holds CALL_QUEUE_MAX_PENDING undelivered calls"""
+
+class DurableCallQueue:
+    """Append call payloads to a local SQLite queue and drain them into Supabase in the background"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Every accepted call is fsynced before the webhook gets its 202
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS call_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    external_call_id TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    lease_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_call_queue_external_call_id ON call_queue(external_call_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_call_queue_due ON call_queue(status, next_attempt_at)")
+            # Undelivered entries counted by triggers, so the full-queue check on every enqueue is one row read;
+            # kept in the file rather than in memory because several workers may share it
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS call_queue_counts (id INTEGER PRIMARY KEY CHECK (id = 1), undelivered INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO call_queue_counts (id, undelivered) SELECT 1, COUNT(*) FROM call_queue WHERE status != 'failed'")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS call_queue_count_insert AFTER INSERT ON call_queue WHEN NEW.status != 'failed'
+                BEGIN UPDATE call_queue_counts SET undelivered = undelivered + 1 WHERE id = 1; END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS call_queue_count_delete AFTER DELETE ON call_queue WHEN OLD.status != 'failed'
+                BEGIN UPDATE call_queue_counts SET undelivered = undelivered - 1 WHERE id = 1; END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS call_queue_count_update AFTER UPDATE OF status ON call_queue
+                WHEN (OLD.status = 'failed') != (NEW.status = 'failed')
+                BEGIN UPDATE call_queue_counts SET undelivered = undelivered + (CASE WHEN NEW.status = 'failed' THEN -1 ELSE 1 END) WHERE id = 1; END
+            """)
+            conn.execute("COMMIT")
+            self._conn = conn
+        return self._conn
+    
+    def _enqueue(self, call_data: CallData) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            pending = conn.execute("SELECT undelivered FROM call_queue_counts WHERE id = 1").fetchone()[0]
+            if pending >= CALL_QUEUE_MAX_PENDING:
+                raise QueueFullError(f"Call queue is full ({pending} undelivered calls)")
+            
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO call_queue (external_call_id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (call_data.call_id, call_data.model_dump_json(), now, now)
+            )
+            if cursor.rowcount:
+                return {"queue_id": cursor.lastrowid, "duplicate": False}
+            
+            # Same external_call_id was already accepted
+            row = conn.execute("SELECT id FROM call_queue WHERE external_call_id = ?", (call_data.call_id,)).fetchone()
+            return {"queue_id": row[0], "duplicate": True}
+    
+    async def enqueue(self, call_data: CallData) -> Dict[str, Any]:
+        """Durably store a call payload, returning its queue id"""
+        result = await asyncio.get_running_loop().run_in_executor(None, self._enqueue, call_data)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return result
+    
+    def _claim_batch(self) -> List[tuple]:
+        """Lease the next due entries so that other workers sharing the file skip them"""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT id, payload, attempts FROM call_queue
+                    WHERE (status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'processing' AND lease_until < ?)
+                    ORDER BY id LIMIT ?
+                    """,
+                    (now, now, CALL_QUEUE_BATCH_SIZE)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE call_queue SET status = 'processing', lease_until = ? WHERE id = ?",
+                    [(now + CALL_QUEUE_LEASE_SECONDS, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return rows
+    
+    def _complete(self, delivered: List[int], failed: List[tuple]) -> None:
+        """Delete delivered entries and reschedule or dead-letter failed ones"""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM call_queue WHERE id = ?", [(queue_id,) for queue_id in delivered])
+            for queue_id, attempts, error in failed:
+                if attempts >= CALL_QUEUE_MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE call_queue SET status = 'failed', attempts = ?, last_error = ?, lease_until = NULL WHERE id = ?",
+                        (attempts, error, queue_id)
+                    )
+                    self.dead_lettered += 1
+                else:
+                    backoff = min(2 ** attempts, CALL_QUEUE_MAX_BACKOFF_SECONDS)
+                    conn.execute(
+                        "UPDATE call_queue SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?, lease_until = NULL WHERE id = ?",
+                        (attempts, error, now + backoff, queue_id)
+                    )
+                    self.retried += 1
+            conn.execute("COMMIT")
+    
+    async def _ingest_split(self, supabase, entries: List[tuple], delivered: List[int], failed: List[tuple]) -> None:
+        """Ingest entries; when the whole write fails, bisect so the attempt is charged only to entries that fail alone"""
+        try:
+            results = await ingest_calls(supabase, [call_data for _, call_data, _ in entries])
+        except Exception as e:
+            if len(entries) == 1:
+                queue_id, _, attempts = entries[0]
+                failed.append((queue_id, attempts + 1, str(e)))
+                return
+            logger.warning("Call queue delivery of %d calls failed, splitting the batch: %s", len(entries), e)
+            middle = len(entries) // 2
+            await self._ingest_split(supabase, entries[:middle], delivered, failed)
+            await self._ingest_split(supabase, entries[middle:], delivered, failed)
+            return
+        
+        for (queue_id, _, attempts), result in zip(entries, results):
+            if result["success"]:
+                delivered.append(queue_id)
+            else:
+                failed.append((queue_id, attempts + 1, result["error"]))
+    
+    async def _deliver(self, rows: List[tuple]) -> None:
+        """Write one claimed batch to Supabase, skipping calls that were already stored"""
+        loop = asyncio.get_running_loop()
+        supabase = get_supabase_client(use_service_role=True)
+        entries = [(queue_id, CallData.model_validate_json(payload), attempts) for queue_id, payload, attempts in rows]
+        
+        delivered: List[int] = []
+        failed: List[tuple] = []
+        try:
+            # Idempotency on external_call_id: a previous attempt may have inserted before failing
+            external_ids = [call_data.call_id for _, call_data, _ in entries if call_data.call_id]
+            stored = set()
+            if external_ids:
+                existing = await execute_query(supabase.table("calls").select("external_call_id").in_("external_call_id", external_ids))
+                stored = {row["external_call_id"] for row in existing.data or []}
+            
+            pending = []
+            for entry in entries:
+                if entry[1].call_id and entry[1].call_id in stored:
+                    delivered.append(entry[0])
+                else:
+                    pending.append(entry)
+            
+            if pending:
+                await self._ingest_split(supabase, pending, delivered, failed)
+        except Exception as e:
+            logger.warning("Call queue delivery failed: %s", e)
+            # The stored-call check failed, so nothing was attempted individually
+            settled = set(delivered) | {queue_id for queue_id, _, _ in failed}
+            failed += [(queue_id, attempts + 1, str(e)) for queue_id, _, attempts in entries if queue_id not in settled]
+        
+        self.delivered += len(delivered)
+        await loop.run_in_executor(None, self._complete, delivered, failed)
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                rows = await loop.run_in_executor(None, self._claim_batch)
+                if rows:
+                    await self._deliver(rows)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Call queue worker error: %s", e)
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=CALL_QUEUE_POLL_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self) -> None:
+        """Open the queue file and start the background drain worker"""
+        self._connect()
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the drain worker; undelivered calls stay on disk for the next start"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth by status and delivery counters"""
+        with self._lock:
+            counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM call_queue GROUP BY status").fetchall())
+        return {
+            "path": self.path,
+            "pending": counts.get("pending", 0),
+            "processing": counts.get("processing", 0),
+            "failed": counts.get("failed", 0),
+            "max_pending": CALL_QUEUE_MAX_PENDING,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered
+        }
+
+call_queue = DurableCallQueue(CALL_QUEUE_PATH)
@@ -0,0 +1,150 @@
+
+import asyncio
+import os
+import time
+from typing import Optional, Dict, Any, Tuple
+from cache import TTLCache
+from database import execute_query
+from change_feed import on_change, on_reset, feed_connected
+
+# Per-campaign snapshot of the campaign, agent, script and knowledge base shared by every call
+CAMPAIGN_CONTEXT_MAX_SIZE = int(os.getenv("CAMPAIGN_CONTEXT_MAX_SIZE", "1000"))
+CAMPAIGN_CONTEXT_TTL_SECONDS = float(os.getenv("CAMPAIGN_CONTEXT_TTL_SECONDS", "3600"))
+# How often a cached snapshot re-checks the updated_at of its rows
+CAMPAIGN_CONTEXT_REVALIDATE_SECONDS = float(os.getenv("CAMPAIGN_CONTEXT_REVALIDATE_SECONDS", "10"))
+# Used instead while the change feed is connected and invalidates snapshots as rows change
+CAMPAIGN_CONTEXT_FEED_REVALIDATE_SECONDS = float(os.getenv("CAMPAIGN_CONTEXT_FEED_REVALIDATE_SECONDS", "300"))
+
+campaign_context_cache = TTLCache("campaign_context", CAMPAIGN_CONTEXT_MAX_SIZE, CAMPAIGN_CONTEXT_TTL_SECONDS)
+active_campaign_cache = TTLCache("active_campaign_by_user", CAMPAIGN_CONTEXT_MAX_SIZE, CAMPAIGN_CONTEXT_REVALIDATE_SECONDS)
+
+# Snapshot builds in progress, so concurrent misses for one campaign share a single build
+_inflight: Dict[str, asyncio.Future] = {}
+
+def _revalidate_seconds() -> float:
+    return CAMPAIGN_CONTEXT_FEED_REVALIDATE_SECONDS if feed_connected() else CAMPAIGN_CONTEXT_REVALIDATE_SECONDS
+
+async def fetch_row(supabase, table: str, row_id: Optional[str], columns: str = "*", **filters: str) -> Optional[Dict[str, Any]]:
+    """Fetch a single row by id, returning None when the id is empty or nothing matches"""
+    if not row_id:
+        return None
+    
+    query = supabase.table(table).select(columns).eq("id", row_id)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    result = await execute_query(query.limit(1))
+    return result.data[0] if result.data else None
+
+def _row_version(row: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Optional[str]]]:
+    return (row["id"], row.get("updated_at")) if row else None
+
+async def _current_version(supabase, campaign: Dict[str, Any]) -> Tuple:
+    """Read only (id, updated_at) of the rows a snapshot was built from"""
+    campaign_row, agent, script, knowledge_base = await asyncio.gather(
+        fetch_row(supabase, "campaigns", campaign["id"], "id, updated_at, agent_id, script_id, knowledge_base_id"),
+        fetch_row(supabase, "agents", campaign.get("agent_id"), "id, updated_at"),
+        fetch_row(supabase, "scripts", campaign.get("script_id"), "id, updated_at"),
+        fetch_row(supabase, "knowledge_base", campaign.get("knowledge_base_id"), "id, updated_at", status="published")
+    )
+    if not campaign_row:
+        return (None,)
+    # A changed reference also changes the version
+    references = (campaign_row.get("agent_id"), campaign_row.get("script_id"), campaign_row.get("knowledge_base_id"))
+    return (_row_version(campaign_row), references, _row_version(agent), _row_version(script), _row_version(knowledge_base))
+
+async def _build_snapshot(supabase, campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Load a campaign and everything it references"""
+    campaign = await fetch_row(supabase, "campaigns", campaign_id)
+    if not campaign:
+        return None
+    
+    agent, script, knowledge_base = await asyncio.gather(
+        fetch_row(supabase, "agents", campaign.get("agent_id")),
+        fetch_row(supabase, "scripts", campaign.get("script_id")),
+        fetch_row(supabase, "knowledge_base", campaign.get("knowledge_base_id"), status="published")
+    )
+    references = (campaign.get("agent_id"), campaign.get("script_id"), campaign.get("knowledge_base_id"))
+    
+    return {
+        "version": (_row_version(campaign), references, _row_version(agent), _row_version(script), _row_version(knowledge_base)),
+        "checked_at": time.monotonic(),
+        "campaign": campaign,
+        "agent": agent,
+        "script": script,
+        "knowledge_bases": [knowledge_base] if knowledge_base else []
+    }
+
+async def _load_snapshot(supabase, campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Return a fresh snapshot, rebuilding it only when its rows changed"""
+    snapshot = campaign_context_cache.get(campaign_id)
+    if snapshot and time.monotonic() - snapshot["checked_at"] < _revalidate_seconds():
+        return snapshot
+    
+    if snapshot and await _current_version(supabase, snapshot["campaign"]) == snapshot["version"]:
+        snapshot["checked_at"] = time.monotonic()
+        return snapshot
+    
+    snapshot = await _build_snapshot(supabase, campaign_id)
+    if snapshot:
+        campaign_context_cache.set(campaign_id, snapshot)
+    else:
+        campaign_context_cache.invalidate(campaign_id)
+    return snapshot
+
+async def get_campaign_context(supabase, campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Campaign, agent, script and knowledge bases for a campaign, or None if the campaign does not exist.
+    
+    The returned dicts are shared between calls and must not be modified."""
+    future = _inflight.get(campaign_id)
+    if future is None:
+        future = asyncio.ensure_future(_load_snapshot(supabase, campaign_id))
+        _inflight[campaign_id] = future
+        future.add_done_callback(lambda _: _inflight.pop(campaign_id, None))
+    
+    # Shield so one caller timing out does not cancel the build for everyone else
+    return await asyncio.shield(future)
+
+async def resolve_active_campaign_id(supabase, user_id: str, campaign_type: str = "inbound") -> Optional[str]:
+    """Id of the user's active campaign of a type; the newest one wins when there are several"""
+    result = await execute_query(
+        supabase.table("campaigns").select("id")
+        .eq("user_id", user_id).eq("status", "active").eq("campaign_type", campaign_type)
+        .order("created_at.desc,id", desc=True).limit(1)
+    )
+    return result.data[0]["id"] if result.data else None
+
+async def get_active_campaign_context(supabase, user_id: str, campaign_type: str = "inbound") -> Optional[Dict[str, Any]]:
+    """Context of the user's active campaign of a type, or None if there is none"""
+    # One entry per user mapping campaign type to the resolved campaign id
+    resolved = active_campaign_cache.get(user_id) or {}
+    if campaign_type not in resolved:
+        resolved = {**resolved, campaign_type: await resolve_active_campaign_id(supabase, user_id, campaign_type)}
+        active_campaign_cache.set(user_id, resolved, ttl_seconds=_revalidate_seconds())
+    
+    if not resolved[campaign_type]:
+        return None
+    return await get_campaign_context(supabase, resolved[campaign_type])
+
+def invalidate_campaign_context(campaign_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+    """Drop a campaign snapshot and/or a user's active campaign entries"""
+    if campaign_id:
+        campaign_context_cache.invalidate(campaign_id)
+    if user_id:
+        active_campaign_cache.invalidate(user_id)
+
+def _drop_snapshots_referencing(key: str, row_id: str) -> None:
+    """Drop every snapshot built from the agent, script or knowledge base with this id"""
+    def references(_: Any, snapshot: Dict[str, Any]) -> bool:
+        rows = snapshot["knowledge_bases"] if key == "knowledge_bases" else [snapshot[key]]
+        return any(row and row["id"] == row_id for row in rows)
+    campaign_context_cache.invalidate_matching(references)
+
+def _on_campaign_change(event: Dict[str, Any]) -> None:
+    invalidate_campaign_context(campaign_id=event["id"], user_id=event.get("user_id"))
+
+on_change("campaigns", _on_campaign_change)
+on_change("agents", lambda event: _drop_snapshots_referencing("agent", event["id"]))
+on_change("scripts", lambda event: _drop_snapshots_referencing("script", event["id"]))
+on_change("knowledge_base", lambda event: _drop_snapshots_referencing("knowledge_bases", event["id"]))
+on_reset(campaign_context_cache.clear)
+on_reset(active_campaign_cache.clear)
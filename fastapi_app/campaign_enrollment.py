@@ -0,0 +1,141 @@
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional, List, Dict, Any, AsyncIterator
+from pydantic import BaseModel
+from database import execute_query
+
+logger = logging.getLogger(__name__)
+
+# campaign_contacts rows written per request while enrolling contacts
+CAMPAIGN_ENROLLMENT_BATCH_SIZE = int(os.getenv("CAMPAIGN_ENROLLMENT_BATCH_SIZE", "1000"))
+
+class ContactFilter(BaseModel):
+    status: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+
+# Background filter enrollments by id; also keeps the tasks from being garbage collected mid-run
+_running: Dict[str, asyncio.Task] = {}
+
+def apply_contact_filter(query, contact_filter: Dict[str, Any]):
+    """Restrict a contacts query to the rows matching an enrollment filter"""
+    for column in ["status", "city", "state", "zip_code"]:
+        if contact_filter.get(column) is not None:
+            query = query.eq(column, contact_filter[column])
+    if contact_filter.get("created_after"):
+        query = query.gte("created_at", contact_filter["created_after"])
+    if contact_filter.get("created_before"):
+        query = query.lt("created_at", contact_filter["created_before"])
+    return query
+
+async def enroll_memberships(supabase, memberships: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Write campaign_id/contact_id pairs spanning any number of campaigns in sized batches.
+    
+    Pairs that are already members are left alone; only the newly inserted rows are returned."""
+    inserted: List[Dict[str, Any]] = []
+    for start in range(0, len(memberships), CAMPAIGN_ENROLLMENT_BATCH_SIZE):
+        result = await execute_query(supabase.table("campaign_contacts").upsert(
+            memberships[start:start + CAMPAIGN_ENROLLMENT_BATCH_SIZE],
+            on_conflict="campaign_id,contact_id",
+            ignore_duplicates=True
+        ))
+        inserted.extend(result.data or [])
+    return inserted
+
+async def enroll_contact_ids(supabase, campaign_id: str, contact_ids: List[str]) -> int:
+    """Enroll an explicit list of contacts in sized batches, returning how many were not members yet; safe to retry as a whole"""
+    memberships = [{"campaign_id": campaign_id, "contact_id": contact_id} for contact_id in dict.fromkeys(contact_ids)]
+    return len(await enroll_memberships(supabase, memberships))
+
+async def create_enrollment(supabase, campaign_id: str, user_id: str, contact_filter: ContactFilter) -> Dict[str, Any]:
+    """Record a filter enrollment so its progress survives restarts"""
+    result = await execute_query(supabase.table("campaign_enrollments").insert({
+        "campaign_id": campaign_id,
+        "user_id": user_id,
+        "contact_filter": contact_filter.model_dump(exclude_none=True),
+        "status": "pending"
+    }))
+    return result.data[0]
+
+async def get_enrollment(supabase, enrollment_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    result = await execute_query(
+        supabase.table("campaign_enrollments").select("*").eq("id", enrollment_id).eq("user_id", user_id).limit(1)
+    )
+    return result.data[0] if result.data else None
+
+async def run_enrollment(supabase, enrollment: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Enroll the user's contacts matching the filter in id order, continuing after last_contact_id.
+    
+    The cursor and count are saved after every batch and each batch is idempotent, so a run
+    that stops anywhere can be resumed without losing or duplicating enrollments."""
+    progress = {
+        "enrollment_id": enrollment["id"],
+        "campaign_id": enrollment["campaign_id"],
+        "status": "running",
+        "enrolled_count": enrollment["enrolled_count"],
+        "last_contact_id": enrollment["last_contact_id"]
+    }
+    try:
+        await execute_query(supabase.table("campaign_enrollments").update({"status": "running", "error": None, "updated_at": datetime.utcnow().isoformat()}).eq("id", enrollment["id"]))
+        
+        while True:
+            query = apply_contact_filter(
+                supabase.table("contacts").select("id").eq("user_id", enrollment["user_id"]),
+                enrollment["contact_filter"] or {}
+            )
+            if progress["last_contact_id"]:
+                query = query.gt("id", progress["last_contact_id"])
+            result = await execute_query(query.order("id").limit(CAMPAIGN_ENROLLMENT_BATCH_SIZE))
+            
+            contact_ids = [row["id"] for row in result.data or []]
+            if contact_ids:
+                # Only contacts that were not members yet count, so a resumed batch is not counted twice
+                inserted = await enroll_memberships(supabase, [
+                    {"campaign_id": enrollment["campaign_id"], "contact_id": contact_id} for contact_id in contact_ids
+                ])
+                progress["enrolled_count"] += len(inserted)
+                progress["last_contact_id"] = contact_ids[-1]
+            
+            if len(contact_ids) < CAMPAIGN_ENROLLMENT_BATCH_SIZE:
+                progress["status"] = "completed"
+            
+            await execute_query(supabase.table("campaign_enrollments").update({
+                "status": progress["status"],
+                "enrolled_count": progress["enrolled_count"],
+                "last_contact_id": progress["last_contact_id"],
+                "updated_at": datetime.utcnow().isoformat()
+            }).eq("id", enrollment["id"]))
+            yield dict(progress)
+            
+            if progress["status"] == "completed":
+                return
+    except Exception as e:
+        # Keep the cursor so the enrollment can be resumed
+        await execute_query(supabase.table("campaign_enrollments").update({
+            "status": "failed",
+            "error": str(e),
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", enrollment["id"]))
+        raise
+
+async def _drain(progress: AsyncIterator[Dict[str, Any]]) -> None:
+    try:
+        async for _ in progress:
+            pass
+    except Exception as e:
+        logger.warning("Campaign enrollment failed: %s", e)
+
+def is_enrollment_running(enrollment_id: str) -> bool:
+    return enrollment_id in _running
+
+def start_enrollment(supabase, enrollment: Dict[str, Any]) -> None:
+    """Run a filter enrollment in the background"""
+    task = asyncio.ensure_future(_drain(run_enrollment(supabase, enrollment)))
+    _running[enrollment["id"]] = task
+    task.add_done_callback(lambda _: _running.pop(enrollment["id"], None))
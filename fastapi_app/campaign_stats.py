@@ -0,0 +1,98 @@
+
+import math
+from datetime import date
+from typing import Optional, List, Dict, Any
+from database import execute_query
+
+# Growth factor of the duration sketch buckets; must match campaign_call_stats_upsert_sql()
+DURATION_SKETCH_GAMMA = 1.02
+
+DURATION_QUANTILES = [0.5, 0.9, 0.95, 0.99]
+
+STATS_COLUMNS = (
+    "agent_id, day, calls, status_counts, outcome_counts, sentiment_count, sentiment_sum, "
+    "objective_known_count, objective_met_count, duration_count, duration_sum, duration_sketch"
+)
+
+def duration_bucket(seconds: int) -> int:
+    """Sketch bucket of a call duration, as computed by the rollup trigger"""
+    return -1 if seconds <= 0 else math.ceil(math.log(seconds) / math.log(DURATION_SKETCH_GAMMA))
+
+def _bucket_value(bucket: int) -> float:
+    # Midpoint that keeps the relative error of every value in the bucket within (gamma - 1) / (gamma + 1)
+    if bucket < 0:
+        return 0.0
+    if bucket == 0:
+        return 1.0
+    return 2 * DURATION_SKETCH_GAMMA ** bucket / (DURATION_SKETCH_GAMMA + 1)
+
+def _add_counts(total: Dict[str, int], counts: Dict[str, int]) -> None:
+    for key, count in counts.items():
+        total[key] = total.get(key, 0) + count
+
+def sketch_quantile(sketch: Dict[str, int], quantile: float) -> Optional[float]:
+    """Approximate quantile of the durations counted in a merged sketch"""
+    buckets = sorted((int(bucket), count) for bucket, count in sketch.items() if count > 0)
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    
+    rank = quantile * (total - 1)
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen > rank:
+            return round(_bucket_value(bucket), 1)
+    return round(_bucket_value(buckets[-1][0]), 1)
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge rollup rows into one set of campaign stats"""
+    status_counts: Dict[str, int] = {}
+    outcome_counts: Dict[str, int] = {}
+    sketch: Dict[str, int] = {}
+    totals = dict.fromkeys(
+        ["calls", "sentiment_count", "sentiment_sum", "objective_known_count", "objective_met_count", "duration_count", "duration_sum"], 0
+    )
+    for row in rows:
+        for field in totals:
+            totals[field] += row[field]
+        _add_counts(status_counts, row["status_counts"])
+        _add_counts(outcome_counts, row["outcome_counts"])
+        _add_counts(sketch, row["duration_sketch"])
+    
+    return {
+        "calls": totals["calls"],
+        "status_counts": {key: count for key, count in status_counts.items() if count},
+        "outcome_counts": {key: count for key, count in outcome_counts.items() if count},
+        "average_sentiment": totals["sentiment_sum"] / totals["sentiment_count"] if totals["sentiment_count"] else None,
+        "objective_met_rate": totals["objective_met_count"] / totals["objective_known_count"] if totals["objective_known_count"] else None,
+        "duration": {
+            "count": totals["duration_count"],
+            "average": totals["duration_sum"] / totals["duration_count"] if totals["duration_count"] else None,
+            **{f"p{round(quantile * 100)}": sketch_quantile(sketch, quantile) for quantile in DURATION_QUANTILES}
+        }
+    }
+
+async def get_campaign_stats(
+    supabase,
+    campaign_id: str,
+    user_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Optional[str] = None
+) -> Dict[str, Any]:
+    """Campaign stats from the rollup rows, optionally broken down by day or agent; start and end are inclusive UTC days"""
+    query = supabase.table("campaign_call_stats").select(STATS_COLUMNS).eq("campaign_id", campaign_id).eq("user_id", user_id)
+    if start:
+        query = query.gte("day", start.isoformat())
+    if end:
+        query = query.lte("day", end.isoformat())
+    rows = (await execute_query(query.order("day"))).data or []
+    
+    stats: Dict[str, Any] = {"total": summarize(rows)}
+    if group_by:
+        groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(row[group_by], []).append(row)
+        stats[f"by_{group_by}"] = [{group_by: key, **summarize(group)} for key, group in groups.items()]
+    return stats
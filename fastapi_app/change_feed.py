@@ -0,0 +1,131 @@
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional, List, Dict, Any, Callable
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# Row-change notifications published by the notify_row_change() triggers; needs a direct
+# (session mode) Postgres connection string, since LISTEN does not work through a transaction pooler
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+CHANGE_FEED_RECONNECT_MAX_SECONDS = float(os.getenv("CHANGE_FEED_RECONNECT_MAX_SECONDS", "30"))
+
+# Channel used by the notify triggers in supabase/migrations
+CHANGE_FEED_CHANNEL = "row_changes"
+
+# table -> invalidation handlers, registered by the modules that own the caches
+_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+# Called when events may have been missed, i.e. after (re)connecting
+_reset_handlers: List[Callable[[], None]] = []
+
+def on_change(table: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+    """Run handler with the payload of every change to table"""
+    _handlers.setdefault(table, []).append(handler)
+
+def on_reset(handler: Callable[[], None]) -> None:
+    """Run handler whenever the feed (re)connects, to drop anything that may have gone stale meanwhile"""
+    _reset_handlers.append(handler)
+
+class ChangeFeedListener:
+    """LISTENs for row-change notifications and applies them to this worker's caches"""
+    
+    def __init__(self, dsn: str = DATABASE_URL, channel: str = CHANGE_FEED_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self.connected = False
+        self.events = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_event_at: Optional[float] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.dsn) and asyncpg is not None
+    
+    def apply(self, payload: str) -> None:
+        """Dispatch one notification payload to the handlers of its table"""
+        try:
+            event = json.loads(payload)
+            for handler in _handlers.get(event["table"], []):
+                handler(event)
+            self.events += 1
+            self.last_event_at = time.time()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Could not apply change feed event %r: %s", payload[:200], e)
+    
+    def _reset(self) -> None:
+        for handler in _reset_handlers:
+            handler()
+    
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, lambda _connection, _pid, _channel, payload: self.apply(payload))
+                
+                # Anything cached before this point may have missed events
+                self._reset()
+                self.connected = True
+                delay = 1.0
+                logger.info("Change feed listening on %s", self.channel)
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Change feed connection failed: %s", e)
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CHANGE_FEED_RECONNECT_MAX_SECONDS)
+    
+    def start(self) -> None:
+        """Start listening; without DATABASE_URL or asyncpg the caches rely on their TTLs alone"""
+        if not self.enabled:
+            logger.info("Change feed disabled (DATABASE_URL or asyncpg missing)")
+            return
+        self._worker = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "channel": self.channel,
+            "events": self.events,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "last_event_at": self.last_event_at,
+            "tables": sorted(_handlers)
+        }
+
+change_feed = ChangeFeedListener()
+
+def feed_connected() -> bool:
+    """Whether cache entries are currently invalidated by the change feed"""
+    return change_feed.connected
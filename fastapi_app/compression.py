@@ -0,0 +1,122 @@
+
+import os
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression; bodies below the threshold are not worth the CPU
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts: br when brotli is installed, then gzip"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    
+    if brotli and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+class _Encoder:
+    """Incremental compressor for one response body"""
+    
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=RESPONSE_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+    
+    def chunk(self, data: bytes) -> bytes:
+        """Compress part of a streamed body and flush it so the client receives it right away"""
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class CompressionMiddleware:
+    """Compress responses with br or gzip according to Accept-Encoding.
+    
+    Complete bodies are compressed only from minimum_size bytes; streamed bodies are always
+    compressed and flushed chunk by chunk so NDJSON progress lines are not held back."""
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(scope=start)
+                # Range offsets refer to the identity body, so partial responses are sent as is
+                if "content-encoding" in headers or "content-range" in headers or (not more_body and len(body) < self.minimum_size):
+                    await send(start)
+                    await send(message)
+                    return
+                
+                encoder = _Encoder(encoding)
+                body = encoder.chunk(body) if more_body else encoder.finish(body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and etag.endswith('"'):
+                    # The compressed body is a different representation, so it needs its own strong tag
+                    headers["ETag"] = etag[:-1] + f'-{encoding}"'
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+            elif encoder is None:
+                await send(message)
+                return
+            else:
+                body = encoder.chunk(body) if more_body else encoder.finish(body)
+            
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,203 @@
+
+import asyncio
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Optional, List, Dict, Any, AsyncIterator
+from database import execute_query, normalize_phone_number, invalidate_contact_phone
+
+# Bulk contact import: rows per write batch and bytes read from the upload at a time
+CONTACT_IMPORT_BATCH_SIZE = int(os.getenv("CONTACT_IMPORT_BATCH_SIZE", "1000"))
+CONTACT_IMPORT_READ_CHUNK_BYTES = int(os.getenv("CONTACT_IMPORT_READ_CHUNK_BYTES", str(1024 * 1024)))
+# Phones per existing-contact lookup, keeping the request URL short
+CONTACT_IMPORT_LOOKUP_CHUNK = int(os.getenv("CONTACT_IMPORT_LOOKUP_CHUNK", "250"))
+# Row errors echoed back in the progress stream
+CONTACT_IMPORT_MAX_ERRORS = int(os.getenv("CONTACT_IMPORT_MAX_ERRORS", "100"))
+
+CONTACT_IMPORT_COLUMNS = ["name", "email", "phone", "address", "city", "state", "zip_code", "status"]
+
+async def _iter_lines(upload) -> AsyncIterator[str]:
+    """Decode an upload as UTF-8 and yield it line by line, reading one chunk at a time"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    remainder = ""
+    while True:
+        chunk = await upload.read(CONTACT_IMPORT_READ_CHUNK_BYTES)
+        text = remainder + decoder.decode(chunk, final=not chunk)
+        lines = text.splitlines(keepends=True)
+        remainder = lines.pop() if lines and chunk and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line
+        if not chunk:
+            if remainder:
+                yield remainder
+            return
+
+async def _iter_csv_records(upload) -> AsyncIterator[List[str]]:
+    """Parse CSV records, joining lines while a quoted field spans line breaks"""
+    pending = ""
+    async for line in _iter_lines(upload):
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        for record in csv.reader([pending]):
+            yield record
+        pending = ""
+    if pending:
+        for record in csv.reader([pending]):
+            yield record
+
+async def iter_import_rows(upload, file_format: str) -> AsyncIterator[Dict[str, Any]]:
+    """Yield raw rows from a CSV (with header) or NDJSON upload; a row that cannot be parsed is yielded as {"_error": ...}"""
+    if file_format == "ndjson":
+        async for line in _iter_lines(upload):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {"_error": f"Invalid JSON: {e}"}
+            yield row if isinstance(row, dict) else {"_error": "Expected a JSON object"}
+        return
+    
+    header = None
+    async for record in _iter_csv_records(upload):
+        if not any(field.strip() for field in record):
+            continue
+        if header is None:
+            header = [field.strip().lower() for field in record]
+            continue
+        yield dict(zip(header, record))
+
+def prepare_contact(row: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    """Map an import row onto contact columns, raising ValueError when it is unusable"""
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    
+    contact = {}
+    for column in CONTACT_IMPORT_COLUMNS:
+        value = row.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in (None, ""):
+            contact[column] = str(value)
+    
+    if not contact.get("name"):
+        raise ValueError("Missing name")
+    phone_normalized = normalize_phone_number(contact.get("phone", ""))
+    if not phone_normalized:
+        raise ValueError("Missing phone")
+    
+    contact["user_id"] = user_id
+    contact["phone_normalized"] = phone_normalized
+    return contact
+
+async def _existing_contact_ids(supabase, user_id: str, phones: List[str]) -> Dict[str, str]:
+    """Map normalized phone to contact id for the user's contacts among phones"""
+    chunks = [phones[i:i + CONTACT_IMPORT_LOOKUP_CHUNK] for i in range(0, len(phones), CONTACT_IMPORT_LOOKUP_CHUNK)]
+    results = await asyncio.gather(*(
+        execute_query(supabase.table("contacts").select("id, phone_normalized").eq("user_id", user_id).in_("phone_normalized", chunk))
+        for chunk in chunks
+    ))
+    existing: Dict[str, str] = {}
+    for result in results:
+        for row in result.data or []:
+            existing.setdefault(row["phone_normalized"], row["id"])
+    return existing
+
+async def write_contact_batch(supabase, user_id: str, batch: Dict[str, Dict[str, Any]], update_existing: bool) -> Dict[str, int]:
+    """Insert new contacts and optionally update existing ones; batch is keyed by normalized phone"""
+    existing = await _existing_contact_ids(supabase, user_id, list(batch))
+    now = datetime.utcnow().isoformat()
+    
+    # Multi-row writes take their columns from the first row, so every new row carries the full set
+    blank = {column: None for column in CONTACT_IMPORT_COLUMNS}
+    new_rows = [
+        {**blank, "status": "active", **contact, "created_at": now, "updated_at": now}
+        for phone, contact in batch.items() if phone not in existing
+    ]
+    # Updates only touch the columns the file provided; rows with the same columns share one upsert on id
+    update_rows = [
+        {**contact, "id": existing[phone], "updated_at": now}
+        for phone, contact in batch.items() if phone in existing
+    ] if update_existing else []
+    update_groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for contact in update_rows:
+        update_groups.setdefault(tuple(sorted(contact)), []).append(contact)
+    
+    writes = []
+    if new_rows:
+        writes.append(execute_query(supabase.table("contacts").insert(new_rows, returning="minimal")))
+    for group in update_groups.values():
+        writes.append(execute_query(supabase.table("contacts").upsert(group, on_conflict="id", returning="minimal")))
+    await asyncio.gather(*writes)
+    
+    for contact in update_rows:
+        invalidate_contact_phone(contact["phone_normalized"])
+    
+    return {
+        "inserted": len(new_rows),
+        "updated": len(update_rows),
+        "skipped_existing": len(existing) - len(update_rows)
+    }
+
+async def import_contacts(supabase, user_id: str, rows: AsyncIterator[Dict[str, Any]], update_existing: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Write rows in batches, yielding a progress report after each batch and a final summary.
+    
+    The next batch is parsed while the previous one is written. Duplicates within a batch are
+    merged (last row wins) and later duplicates are caught by the existing-contact lookup, so
+    memory is bounded by the batch size rather than the file size."""
+    progress = {
+        "rows_read": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skipped_existing": 0,
+        "duplicates_in_file": 0,
+        "invalid": 0,
+        "batches": 0
+    }
+    errors: List[Dict[str, Any]] = []
+    batch: Dict[str, Dict[str, Any]] = {}
+    writing: Optional[asyncio.Task] = None
+    
+    async def finish_write() -> Dict[str, Any]:
+        counts = await writing
+        for key, value in counts.items():
+            progress[key] += value
+        progress["batches"] += 1
+        return {"done": False, **progress}
+    
+    try:
+        async for row in rows:
+            progress["rows_read"] += 1
+            try:
+                contact = prepare_contact(row, user_id)
+            except ValueError as e:
+                progress["invalid"] += 1
+                if len(errors) < CONTACT_IMPORT_MAX_ERRORS:
+                    errors.append({"row": progress["rows_read"], "error": str(e)})
+                continue
+            
+            if contact["phone_normalized"] in batch:
+                progress["duplicates_in_file"] += 1
+            batch[contact["phone_normalized"]] = contact
+            
+            if len(batch) >= CONTACT_IMPORT_BATCH_SIZE:
+                # Wait for the previous batch so the existing-contact lookup sees its rows
+                if writing is not None:
+                    yield await finish_write()
+                writing = asyncio.ensure_future(write_contact_batch(supabase, user_id, batch, update_existing))
+                batch = {}
+        
+        if writing is not None:
+            yield await finish_write()
+        if batch:
+            writing = asyncio.ensure_future(write_contact_batch(supabase, user_id, batch, update_existing))
+            yield await finish_write()
+        writing = None
+    finally:
+        if writing is not None and not writing.done():
+            writing.cancel()
+    
+    yield {"done": True, **progress, "errors": errors}
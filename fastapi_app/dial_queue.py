@@ -0,0 +1,101 @@
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+from database import execute_query, or_filter
+
+# Dial queue leasing for outbound dialer workers
+DIAL_QUEUE_LEASE_SECONDS = int(os.getenv("DIAL_QUEUE_LEASE_SECONDS", "300"))
+DIAL_QUEUE_MAX_CLAIM = int(os.getenv("DIAL_QUEUE_MAX_CLAIM", "100"))
+DIAL_QUEUE_MAX_ATTEMPTS = int(os.getenv("DIAL_QUEUE_MAX_ATTEMPTS", "3"))
+DIAL_QUEUE_RETRY_DELAY_SECONDS = int(os.getenv("DIAL_QUEUE_RETRY_DELAY_SECONDS", "900"))
+# Concurrent leases per campaign when campaigns.max_concurrent_calls is not set; 0 means unlimited
+DIAL_QUEUE_DEFAULT_MAX_CONCURRENT = int(os.getenv("DIAL_QUEUE_DEFAULT_MAX_CONCURRENT", "0"))
+
+DIAL_STATUSES = ["queued", "leased", "completed", "failed"]
+
+# Lease columns cleared when a lease ends
+_RELEASE = {"lease_token": None, "leased_by": None, "leased_until": None}
+
+async def claim_dial_leases(supabase, campaign_id: str, worker_id: str, limit: int, lease_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Lease the next due contacts of a campaign; concurrent claims never receive the same row"""
+    result = await execute_query(supabase.rpc("claim_dial_leases", {
+        "p_campaign_id": campaign_id,
+        "p_worker": worker_id,
+        "p_limit": min(limit, DIAL_QUEUE_MAX_CLAIM),
+        "p_lease_seconds": lease_seconds or DIAL_QUEUE_LEASE_SECONDS,
+        "p_default_max_concurrent": DIAL_QUEUE_DEFAULT_MAX_CONCURRENT or None,
+        "p_max_attempts": DIAL_QUEUE_MAX_ATTEMPTS
+    }))
+    return result.data or []
+
+async def _update_lease(supabase, lease_id: str, lease_token: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Update a lease only while the caller still holds it"""
+    result = await execute_query(
+        supabase.table("campaign_contacts").update(values)
+        .eq("id", lease_id).eq("lease_token", lease_token).eq("dial_status", "leased")
+    )
+    return result.data[0] if result.data else None
+
+async def extend_dial_lease(supabase, lease_id: str, lease_token: str, lease_seconds: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Push back a lease's expiry while its call is still in progress"""
+    leased_until = datetime.utcnow() + timedelta(seconds=lease_seconds or DIAL_QUEUE_LEASE_SECONDS)
+    return await _update_lease(supabase, lease_id, lease_token, {"leased_until": leased_until.isoformat()})
+
+async def complete_dial_lease(
+    supabase,
+    lease_id: str,
+    lease_token: str,
+    outcome: str,
+    rescheduled_for: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Finish a lease: completed, or requeued for retry (at rescheduled_for when given) until attempts run out"""
+    if outcome == "completed":
+        return await _update_lease(supabase, lease_id, lease_token, {**_RELEASE, "dial_status": "completed"})
+    
+    lease = await execute_query(supabase.table("campaign_contacts").select("attempts").eq("id", lease_id).eq("lease_token", lease_token).limit(1))
+    if not lease.data:
+        return None
+    attempts = lease.data[0]["attempts"]
+    
+    if outcome == "failed" or attempts >= DIAL_QUEUE_MAX_ATTEMPTS:
+        return await _update_lease(supabase, lease_id, lease_token, {**_RELEASE, "dial_status": "failed"})
+    
+    if rescheduled_for:
+        return await _update_lease(supabase, lease_id, lease_token, {**_RELEASE, "dial_status": "queued", "next_dial_at": rescheduled_for})
+    
+    next_dial_at = datetime.utcnow() + timedelta(seconds=DIAL_QUEUE_RETRY_DELAY_SECONDS * attempts)
+    return await _update_lease(supabase, lease_id, lease_token, {**_RELEASE, "dial_status": "queued", "next_dial_at": next_dial_at.isoformat()})
+
+async def reschedule_campaign_contacts(supabase, rescheduled: List[Dict[str, Any]]) -> None:
+    """Requeue campaign memberships whose call asked to be called back later.
+    
+    Completed and failed memberships are left alone, as are leases a dialer still holds;
+    memberships that have used their last attempt are failed instead of requeued."""
+    now = datetime.utcnow().isoformat()
+    requeueable = f'dial_status.eq.queued,and(dial_status.eq.leased,leased_until.lte."{now}")'
+    
+    def membership_update(item: Dict[str, Any], values: Dict[str, Any]):
+        query = supabase.table("campaign_contacts").update({**_RELEASE, **values})
+        return or_filter(query.eq("campaign_id", item["campaign_id"]).eq("contact_id", item["contact_id"]), requeueable)
+    
+    await asyncio.gather(*(
+        execute_query(update)
+        for item in rescheduled
+        for update in (
+            membership_update(item, {"dial_status": "queued", "next_dial_at": item["rescheduled_for"]}).lt("attempts", DIAL_QUEUE_MAX_ATTEMPTS),
+            membership_update(item, {"dial_status": "failed"}).gte("attempts", DIAL_QUEUE_MAX_ATTEMPTS)
+        )
+    ))
+
+async def dial_queue_stats(supabase, campaign_id: str) -> Dict[str, int]:
+    """Number of campaign memberships in each dial status"""
+    results = await asyncio.gather(*(
+        execute_query(
+            supabase.table("campaign_contacts").select("id", count="exact")
+            .eq("campaign_id", campaign_id).eq("dial_status", status).limit(1)
+        )
+        for status in DIAL_STATUSES
+    ))
+    return {status: result.count or 0 for status, result in zip(DIAL_STATUSES, results)}
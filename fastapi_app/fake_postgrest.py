@@ -0,0 +1,329 @@
+
+"""In-memory stand-in for the Supabase REST API, for benchmarks that run offline.
+
+Implements the subset of PostgREST the API uses: column filters (eq, neq, gt, gte,
+lt, lte, in, is, like, ilike and their not. forms), or=(...)/and(...) groups,
+multi-column order with nulls placement, limit/offset, exact counts, embedded
+to-one resources (contacts!inner(name)), insert, upsert, update and delete, and the
+replace_knowledge_base_chunks function.
+Equality lookups use per-column hash indexes so large tables stay fast.
+
+Usage:
+    fake = FakePostgrest(latency_ms=2)
+    fake.insert("contacts", rows)
+    database._transport = fake.transport()
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple, Callable
+import httpx
+
+Row = Dict[str, Any]
+
+# Columns given a hash index on first equality lookup
+INDEXED_COLUMNS = {
+    "id", "user_id", "phone_normalized", "campaign_id", "contact_id", "setting_value",
+    "knowledge_base_id", "external_call_id", "status"
+}
+
+_FILTER_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "in", "is", "like", "ilike"}
+
+def _split_top_level(text: str, separator: str = ",") -> List[str]:
+    """Split on separator outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+def _coerce(value: str, like: Any) -> Any:
+    """Convert a filter value to the type of the stored value it is compared with"""
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+def _like(pattern: str, case_insensitive: bool) -> re.Pattern:
+    regex = "".join(".*" if char in "*%" else re.escape(char) for char in pattern)
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL if case_insensitive else re.DOTALL)
+
+def _condition(column: str, expression: str) -> Callable[[Row], bool]:
+    """Predicate for one PostgREST filter such as eq.5, in.(a,b), not.is.null"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition(".")
+    if operator not in _FILTER_OPERATORS:
+        raise ValueError(f"Unsupported operator: {operator}")
+    
+    if operator == "in":
+        values = {_unquote(item) for item in _split_top_level(raw.strip("()"))}
+        test = lambda value: value is not None and str(value) in values
+    elif operator == "is":
+        expected = {"null": None, "true": True, "false": False}[raw.lower()]
+        test = lambda value: value is expected
+    elif operator in ("like", "ilike"):
+        pattern = _like(_unquote(raw), operator == "ilike")
+        test = lambda value: value is not None and bool(pattern.match(str(value)))
+    else:
+        target = _unquote(raw)
+        compare = {
+            "eq": lambda a, b: a == b,
+            "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b
+        }[operator]
+        
+        def test(value: Any) -> bool:
+            if value is None:
+                return False
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            return compare(value, _coerce(target, value))
+    
+    if negate:
+        return lambda row: not test(row.get(column))
+    return lambda row: test(row.get(column))
+
+def _logic(expression: str, combine: Callable) -> Callable[[Row], bool]:
+    """Predicate for the inside of or=(...) / and(...)"""
+    predicates = []
+    for part in _split_top_level(expression.strip()[1:-1]):
+        if part.startswith(("and(", "or(")):
+            name, _, inner = part.partition("(")
+            predicates.append(_logic("(" + inner, all if name == "and" else any))
+        else:
+            column, _, rest = part.partition(".")
+            predicates.append(_condition(column, rest))
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+def _parse_select(select: str) -> Tuple[Optional[List[str]], List[Tuple[str, bool, List[str]]]]:
+    """Plain columns (None for *) and embedded resources as (table, inner, columns)"""
+    columns: Optional[List[str]] = []
+    embeds = []
+    for item in _split_top_level(select.replace(" ", "")):
+        if "(" in item:
+            name, _, inner = item.partition("(")
+            table, _, hint = name.partition("!")
+            embeds.append((table, hint == "inner", inner.rstrip(")").split(",")))
+        elif item == "*":
+            columns = None
+        elif columns is not None:
+            columns.append(item)
+    return columns, embeds
+
+def _order(rows: List[Row], spec: str) -> List[Row]:
+    """Sort by a PostgREST order spec such as created_at.desc,id.desc or updated_at.desc.nullslast"""
+    for term in reversed(spec.split(",")):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+class FakePostgrest:
+    """Thread-safe in-memory tables served through an httpx transport"""
+    
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, List[Row]] = {}
+        self.requests = 0
+        self._indexes: Dict[str, Dict[str, Dict[Any, List[Row]]]] = {}
+        self._lock = threading.RLock()
+    
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+    
+    def insert(self, table: str, rows: List[Row]) -> List[Row]:
+        """Add rows, filling id and timestamps like the table defaults would"""
+        now = datetime.utcnow().isoformat() + "+00:00"
+        with self._lock:
+            stored = self.tables.setdefault(table, [])
+            indexes = self._indexes.get(table, {})
+            for row in rows:
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", now)
+                row.setdefault("updated_at", now)
+                stored.append(row)
+                for column, index in indexes.items():
+                    index.setdefault(row.get(column), []).append(row)
+        return rows
+    
+    def _index(self, table: str, column: str) -> Dict[Any, List[Row]]:
+        indexes = self._indexes.setdefault(table, {})
+        index = indexes.get(column)
+        if index is None:
+            index = indexes[column] = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(row.get(column), []).append(row)
+        return index
+    
+    def _candidates(self, table: str, filters: List[Tuple[str, str]]) -> List[Row]:
+        """Rows that can match, narrowed with an index on the first indexed eq/in filter"""
+        for column, expression in filters:
+            if column not in INDEXED_COLUMNS:
+                continue
+            if expression.startswith("eq."):
+                return list(self._index(table, column).get(_unquote(expression[3:]), []))
+            if expression.startswith("in."):
+                index = self._index(table, column)
+                values = dict.fromkeys(_unquote(item) for item in _split_top_level(expression[3:].strip("()")))
+                return [row for value in values for row in index.get(value, [])]
+        return list(self.tables.get(table, []))
+    
+    def _select(self, table: str, params: httpx.QueryParams) -> List[Row]:
+        filters = [
+            (key, value) for key, value in params.multi_items()
+            if key not in ("select", "order", "limit", "offset", "or", "on_conflict", "columns")
+        ]
+        predicates = [_condition(column, expression) for column, expression in filters]
+        if "or" in params:
+            predicates.append(_logic(params["or"], any))
+        return [row for row in self._candidates(table, filters) if all(predicate(row) for predicate in predicates)]
+    
+    def _project(self, rows: List[Row], select: str) -> List[Row]:
+        columns, embeds = _parse_select(select or "*")
+        projected = []
+        for row in rows:
+            item = dict(row) if columns is None else {column: row.get(column) for column in columns}
+            keep = True
+            for embed_table, inner, embed_columns in embeds:
+                # To-one embed through <singular>_id, e.g. contacts -> contact_id
+                foreign_key = embed_table.rstrip("s") + "_id"
+                matches = self._index(embed_table, "id").get(row.get(foreign_key), [])
+                if not matches and inner:
+                    keep = False
+                    break
+                item[embed_table] = (
+                    {column: matches[0].get(column) for column in embed_columns} if matches else None
+                )
+            if keep:
+                projected.append(item)
+        return projected
+    
+    def _response(self, status: int, rows: Optional[List[Row]], prefer: str, total: Optional[int] = None) -> httpx.Response:
+        headers = {"content-type": "application/json"}
+        if total is not None:
+            end = len(rows or []) - 1
+            headers["content-range"] = f"0-{end}/{total}" if end >= 0 else f"*/{total}"
+        if "return=minimal" in prefer or rows is None:
+            return httpx.Response(status, headers=headers)
+        return httpx.Response(status, content=json.dumps(rows).encode(), headers=headers)
+    
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.requests += 1
+        
+        parts = request.url.path.strip("/").split("/")
+        if parts[:2] != ["rest", "v1"] or len(parts) < 3:
+            return httpx.Response(401, json={"message": "Only the REST API is simulated"})
+        if parts[2] == "rpc":
+            function = getattr(self, f"_rpc_{parts[3]}", None)
+            if function is None:
+                return httpx.Response(404, json={"message": f"Function {parts[3]} is not simulated", "code": "PGRST202"})
+            with self._lock:
+                return httpx.Response(200, json=function(**json.loads(request.content or b"{}")))
+        
+        table = parts[2]
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+        try:
+            with self._lock:
+                if request.method in ("GET", "HEAD"):
+                    return self._get(table, params, prefer)
+                if request.method == "POST":
+                    return self._post(table, params, prefer, json.loads(request.content or b"[]"))
+                if request.method == "PATCH":
+                    return self._patch(table, params, prefer, json.loads(request.content or b"{}"))
+                if request.method == "DELETE":
+                    return self._delete(table, params, prefer)
+        except (ValueError, KeyError) as e:
+            return httpx.Response(400, json={"message": str(e), "code": "PGRST100"})
+        return httpx.Response(405, json={"message": "Method not allowed"})
+    
+    def _get(self, table: str, params: httpx.QueryParams, prefer: str) -> httpx.Response:
+        rows = self._select(table, params)
+        total = len(rows) if "count=exact" in prefer else None
+        if "order" in params:
+            rows = _order(rows, params["order"])
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        elif offset:
+            rows = rows[offset:]
+        return self._response(200, self._project(rows, params.get("select", "*")), prefer, total)
+    
+    def _post(self, table: str, params: httpx.QueryParams, prefer: str, body: Any) -> httpx.Response:
+        rows = body if isinstance(body, list) else [body]
+        if "resolution=" in prefer:
+            conflict_columns = params.get("on_conflict", "id").split(",")
+            ignore = "resolution=ignore-duplicates" in prefer
+            keyed = {
+                tuple(str(row.get(column)) for column in conflict_columns): row
+                for row in self.tables.get(table, [])
+            }
+            written = []
+            for row in rows:
+                existing = keyed.get(tuple(str(row.get(column)) for column in conflict_columns))
+                if existing is None:
+                    written.extend(self.insert(table, [dict(row)]))
+                elif not ignore:
+                    self._update_rows(table, [existing], row)
+                    written.append(existing)
+            return self._response(201, written, prefer)
+        return self._response(201, self.insert(table, [dict(row) for row in rows]), prefer)
+    
+    def _update_rows(self, table: str, rows: List[Row], values: Row) -> None:
+        for row in rows:
+            row.update(values)
+        # Indexes over changed columns are rebuilt on next use
+        indexes = self._indexes.get(table, {})
+        for column in values:
+            indexes.pop(column, None)
+    
+    def _patch(self, table: str, params: httpx.QueryParams, prefer: str, values: Row) -> httpx.Response:
+        rows = self._select(table, params)
+        self._update_rows(table, rows, values)
+        return self._response(200, self._project(rows, params.get("select", "*")), prefer)
+    
+    def _rpc_replace_knowledge_base_chunks(self, p_knowledge_base_id: str, p_user_id: str, p_chunks: List[Row]) -> int:
+        self._delete("knowledge_base_chunks", httpx.QueryParams({"knowledge_base_id": f"eq.{p_knowledge_base_id}"}), "")
+        self.insert("knowledge_base_chunks", [
+            {"knowledge_base_id": p_knowledge_base_id, "user_id": p_user_id, **chunk} for chunk in p_chunks
+        ])
+        return len(p_chunks)
+    
+    def _delete(self, table: str, params: httpx.QueryParams, prefer: str) -> httpx.Response:
+        rows = self._select(table, params)
+        removed = {id(row) for row in rows}
+        self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in removed]
+        self._indexes.pop(table, None)
+        return self._response(200, rows, prefer)
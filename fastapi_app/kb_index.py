@@ -0,0 +1,185 @@
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Optional, List, Dict, Any, Tuple
+from cache import TTLCache
+from database import execute_query
+from change_feed import on_change, on_reset
+
+# Knowledge base chunking and BM25 retrieval
+KB_CHUNK_WORDS = int(os.getenv("KB_CHUNK_WORDS", "200"))
+KB_CHUNK_OVERLAP_WORDS = int(os.getenv("KB_CHUNK_OVERLAP_WORDS", "40"))
+KB_SEARCH_MAX_RESULTS = int(os.getenv("KB_SEARCH_MAX_RESULTS", "20"))
+KB_INDEX_CACHE_MAX_SIZE = int(os.getenv("KB_INDEX_CACHE_MAX_SIZE", "500"))
+KB_INDEX_TTL_SECONDS = float(os.getenv("KB_INDEX_TTL_SECONDS", "600"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Rows per page when loading chunks; PostgREST caps responses at 1000 rows by default
+_CHUNK_PAGE_SIZE = 1000
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+kb_index_cache = TTLCache("kb_indexes", KB_INDEX_CACHE_MAX_SIZE, KB_INDEX_TTL_SECONDS)
+
+# Other workers re-chunking a knowledge base make this worker's index stale
+on_change("knowledge_base", lambda event: kb_index_cache.invalidate(event["id"]))
+on_change("knowledge_base_chunks", lambda event: kb_index_cache.invalidate(event["knowledge_base_id"]))
+on_reset(kb_index_cache.clear)
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def chunk_text(content: Optional[str], max_words: int = KB_CHUNK_WORDS, overlap: int = KB_CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Split text into chunks of about max_words words, preferring paragraph breaks, with overlapping windows for long paragraphs"""
+    if not content or not content.strip():
+        return []
+    
+    chunks: List[str] = []
+    current: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", content):
+        words = paragraph.split()
+        if not words:
+            continue
+        
+        if current and len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = []
+        
+        if len(words) <= max_words:
+            current.extend(words)
+            continue
+        
+        # Long paragraph: fixed windows that overlap so no sentence is cut off from its context
+        step = max(max_words - overlap, 1)
+        for start in range(0, len(words), step):
+            chunks.append(" ".join(words[start:start + max_words]))
+            if start + max_words >= len(words):
+                break
+    
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one knowledge base"""
+    
+    def __init__(self, chunks: List[str]):
+        self.chunks = chunks
+        self.term_frequencies = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        
+        document_frequencies: Counter = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequencies.update(frequencies.keys())
+        count = len(chunks)
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+    
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top k (chunk_index, score) pairs with a positive score"""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        if not terms or not self.average_length:
+            return []
+        
+        scores = []
+        for index, frequencies in enumerate(self.term_frequencies):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / self.average_length)
+            for term in terms:
+                frequency = frequencies.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if score > 0:
+                scores.append((index, score))
+        
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:k]
+
+async def index_knowledge_base(supabase, knowledge_base: Dict[str, Any]) -> int:
+    """Replace the stored chunks of a knowledge base with chunks of its current content.
+    
+    The replace is one transaction, so on failure the previous chunks stay in place."""
+    chunks = [
+        {"chunk_index": index, "content": chunk, "token_count": len(tokenize(chunk))}
+        for index, chunk in enumerate(chunk_text(knowledge_base.get("content")))
+    ]
+    await execute_query(supabase.rpc("replace_knowledge_base_chunks", {
+        "p_knowledge_base_id": knowledge_base["id"],
+        "p_user_id": knowledge_base["user_id"],
+        "p_chunks": chunks
+    }))
+    
+    kb_index_cache.invalidate(knowledge_base["id"])
+    return len(chunks)
+
+async def _load_chunks(supabase, knowledge_base_id: str) -> Optional[List[str]]:
+    """Stored chunks in order, or None unless the knowledge base is published; knowledge bases indexed before chunking existed are chunked on the fly"""
+    # Search runs with the service role and no user, so drafts must not be readable through it
+    published = await execute_query(
+        supabase.table("knowledge_base").select("id").eq("id", knowledge_base_id).eq("status", "published").limit(1)
+    )
+    if not published.data:
+        return None
+    
+    chunks: List[str] = []
+    while True:
+        result = await execute_query(
+            supabase.table("knowledge_base_chunks").select("chunk_index, content")
+            .eq("knowledge_base_id", knowledge_base_id).gte("chunk_index", len(chunks))
+            .order("chunk_index").limit(_CHUNK_PAGE_SIZE)
+        )
+        rows = result.data or []
+        chunks.extend(row["content"] for row in rows)
+        if len(rows) < _CHUNK_PAGE_SIZE:
+            break
+    
+    if chunks:
+        return chunks
+    
+    result = await execute_query(
+        supabase.table("knowledge_base").select("content").eq("id", knowledge_base_id).eq("status", "published").limit(1)
+    )
+    return chunk_text(result.data[0].get("content")) if result.data else None
+
+async def get_kb_index(supabase, knowledge_base_id: str) -> Optional[BM25Index]:
+    """Cached index of a published knowledge base; unpublishing it invalidates the cache through the change feed"""
+    index = kb_index_cache.get(knowledge_base_id)
+    if index is None:
+        chunks = await _load_chunks(supabase, knowledge_base_id)
+        if chunks is None:
+            return None
+        index = BM25Index(chunks)
+        kb_index_cache.set(knowledge_base_id, index)
+    return index
+
+async def search_knowledge_base(supabase, knowledge_base_id: str, query: str, k: int) -> Optional[List[Dict[str, Any]]]:
+    """Top-k chunks of a knowledge base for a query, or None when it is not a published knowledge base"""
+    index = await get_kb_index(supabase, knowledge_base_id)
+    if index is None:
+        return None
+    return [
+        {"chunk_index": chunk_index, "score": round(score, 4), "content": index.chunks[chunk_index]}
+        for chunk_index, score in index.search(query, min(k, KB_SEARCH_MAX_RESULTS))
+    ]
+
+def knowledge_base_ref(knowledge_base: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact reference to a knowledge base for call-details responses, without its content"""
+    content = knowledge_base.get("content") or ""
+    return {
+        "id": knowledge_base["id"],
+        "title": knowledge_base.get("title"),
+        "type": knowledge_base.get("type"),
+        "description": knowledge_base.get("description"),
+        "tags": knowledge_base.get("tags"),
+        "updated_at": knowledge_base.get("updated_at"),
+        "content_length": len(content),
+        "search_path": f"/call-details/knowledge-search?knowledge_base_id={knowledge_base['id']}"
+    }
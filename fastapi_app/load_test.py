@@ -0,0 +1,112 @@
+"""Measure how endpoint throughput scales with client concurrency.
+
+Runs a fixed-duration closed loop against a running instance of the API for
+each concurrency level and prints requests/second and latency percentiles.
+
+Usage:
+    python load_test.py --base-url http://localhost:8000 --token dhwani_... --phone +15551234567
+    python load_test.py --concurrency 1,10,50,200 --duration 15
+    python load_test.py --accept-encoding identity   # compare bytes/response without compression
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+import httpx
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def run_level(
+    client: httpx.AsyncClient,
+    path: str,
+    params: Dict[str, str],
+    headers: Dict[str, str],
+    concurrency: int,
+    duration: float
+) -> Dict[str, float]:
+    """Keep `concurrency` requests in flight against path for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    bytes_received = 0
+    deadline = time.perf_counter() + duration
+    
+    async def worker():
+        nonlocal errors, bytes_received
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params, headers=headers)
+                bytes_received += response.num_bytes_downloaded
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "bytes_per_response": bytes_received / len(latencies) if latencies else 0.0
+    }
+
+async def run(
+    base_url: str,
+    token: Optional[str],
+    phone: str,
+    concurrency_levels: List[int],
+    duration: float,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    accept_encoding: str = "gzip, br"
+) -> List[Dict[str, float]]:
+    """Run every scenario at every concurrency level and print a results table"""
+    headers = {"Accept-Encoding": accept_encoding}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    scenarios = [
+        ("/contacts/list", {}),
+        ("/call-details/caller-details", {"phone": phone})
+    ]
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    results = []
+    
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60, transport=transport) as client:
+        for path, params in scenarios:
+            print(f"\n{path}")
+            print(f"{'concurrency':>12} {'requests':>10} {'errors':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'bytes/resp':>11}")
+            for concurrency in concurrency_levels:
+                result = await run_level(client, path, params, headers, concurrency, duration)
+                result["path"] = path
+                results.append(result)
+                print(
+                    f"{result['concurrency']:>12} {result['requests']:>10} {result['errors']:>8} "
+                    f"{result['throughput']:>10.1f} {result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['bytes_per_response']:>11.0f}"
+                )
+    
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput vs. concurrency load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default=None, help="Session token or dhwani_ API key")
+    parser.add_argument("--phone", default="+15550000000", help="Phone number for caller-details")
+    parser.add_argument("--concurrency", default="1,10,50,100,200", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--accept-encoding", default="gzip, br", help="Accept-Encoding sent with every request")
+    args = parser.parse_args()
+    
+    levels = [int(level) for level in args.concurrency.split(",")]
+    asyncio.run(run(args.base_url, args.token, args.phone, levels, args.duration, accept_encoding=args.accept_encoding))
@@ -1,23 +1,51 @@
 
 from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import uvicorn
 import os
 from typing import Optional, Dict, Any
 import json
+from contextlib import asynccontextmanager
+from cache import cache_stats
+from database import init_supabase_clients, close_supabase_clients, pool_stats
+from call_ingest import call_write_buffer
+from call_queue import call_queue
+from agent_routing import agent_routing
+from change_feed import change_feed
+from compression import CompressionMiddleware
+from serialization import JSONResponseClass
+from metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
 
 # Import route modules
 from routes import (
     agents, campaigns, contacts, scripts, 
     knowledge_base, voices, call_details, 
-    call_data, entities
+    call_data, entities, dial_queue
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Supabase client per key role for the lifetime of the app
+    init_supabase_clients()
+    call_queue.start()
+    agent_routing.start()
+    change_feed.start()
+    yield
+    await change_feed.stop()
+    await agent_routing.stop()
+    await call_queue.stop()
+    if call_write_buffer:
+        await call_write_buffer.flush()
+    close_supabase_clients()
+
 app = FastAPI(
     title="AI Calling Platform API",
     description="FastAPI replication of Supabase Edge Functions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=JSONResponseClass
 )
 
 # CORS middleware
@@ -29,6 +57,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/br response compression above RESPONSE_COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and database round-trip metrics, outermost so they cover the whole request
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
@@ -42,6 +77,7 @@ app.include_router(voices.router, prefix="/voices", tags=["voices"])
 app.include_router(call_details.router, prefix="/call-details", tags=["call-details"])
 app.include_router(call_data.router, prefix="/call-data", tags=["call-data"])
 app.include_router(entities.router, prefix="/entities", tags=["entities"])
+app.include_router(dial_queue.router, prefix="/dial-queue", tags=["dial-queue"])
 
 @app.get("/")
 async def root():
@@ -51,5 +87,25 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return {"caches": cache_stats()}
+
+@app.get("/change-feed-stats")
+async def get_change_feed_stats():
+    return change_feed.stats()
+
+@app.get("/routing-stats")
+async def get_routing_stats():
+    return agent_routing.stats()
+
+@app.get("/pool-stats")
+async def get_pool_stats():
+    return pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
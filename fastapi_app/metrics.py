@@ -0,0 +1,179 @@
+
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Any, Tuple
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from cache import cache_stats
+
+# Request metrics exposed at /metrics in the Prometheus text format
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+ROUND_TRIP_BUCKETS = [0, 1, 2, 3, 5, 8, 13, 21, 50, 100]
+ROW_BUCKETS = [0, 1, 10, 100, 1000, 10000, 100000]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+    
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value:g}" for key, value in values)
+        return lines
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency by route template", LATENCY_BUCKETS)
+db_round_trips = Histogram("db_round_trips_per_request", "Supabase HTTP round trips made while serving one request", ROUND_TRIP_BUCKETS)
+db_rows = Histogram("db_rows_per_request", "Rows returned by Supabase queries while serving one request", ROW_BUCKETS)
+db_response_bytes = Counter("db_response_bytes_total", "Bytes received from Supabase by route template")
+db_request_duration = Histogram("db_request_duration_seconds", "Supabase round-trip latency by table or RPC", LATENCY_BUCKETS)
+
+class RequestStats:
+    """Database work done on behalf of one HTTP request"""
+    
+    __slots__ = ("round_trips", "rows", "bytes")
+    
+    def __init__(self):
+        self.round_trips = 0
+        self.rows = 0
+        self.bytes = 0
+
+# Set by MetricsMiddleware; database.run_blocking copies the context into executor threads
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def _db_target(request: httpx.Request) -> str:
+    """Table, rpc/<function> or auth, so the label set stays bounded"""
+    parts = request.url.path.strip("/").split("/")
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        return "/".join(parts[2:4]) if parts[2] == "rpc" else parts[2]
+    return parts[0] or "unknown"
+
+def _on_db_request(request: httpx.Request) -> None:
+    request.extensions["metrics_started"] = time.perf_counter()
+
+def _on_db_response(response: httpx.Response) -> None:
+    # Read the body here so its size is known; the client reuses it afterwards
+    response.read()
+    request = response.request
+    started = request.extensions.get("metrics_started")
+    if started is not None:
+        db_request_duration.observe(time.perf_counter() - started, target=_db_target(request), method=request.method)
+    
+    stats = request_stats.get()
+    if stats is not None:
+        stats.round_trips += 1
+        # Wire size when the body was streamed from the network, decoded size otherwise
+        stats.bytes += response.num_bytes_downloaded or len(response.content)
+
+# Passed to the pooled PostgREST and auth HTTP clients
+DB_EVENT_HOOKS = {"request": [_on_db_request], "response": [_on_db_response]} if METRICS_ENABLED else {}
+
+def record_rows(data: Any) -> None:
+    """Count rows returned by an executed query against the current request"""
+    stats = request_stats.get()
+    if stats is not None and isinstance(data, list):
+        stats.rows += len(data)
+
+class MetricsMiddleware:
+    """Time every HTTP request by route template and attribute Supabase work to it"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_stats.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, method=scope["method"], route=path, status=str(status))
+            db_round_trips.observe(stats.round_trips, route=path)
+            db_rows.observe(stats.rows, route=path)
+            if stats.bytes:
+                db_response_bytes.inc(stats.bytes, route=path)
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in [http_request_duration, db_round_trips, db_rows, db_response_bytes, db_request_duration]:
+        lines.extend(metric.render())
+    
+    caches = cache_stats()
+    for field, help_text in [("hits", "Cache hits"), ("misses", "Cache misses"), ("evictions", "Cache evictions")]:
+        name = f"cache_{field}_total"
+        lines.append(f"# HELP {name} {help_text} by cache")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f'{name}{{cache="{cache}"}} {stats[field]}' for cache, stats in sorted(caches.items()))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,46 @@
+"""Move transcripts stored inline in calls to the transcript blob store.
+
+Usage:
+    TRANSCRIPT_STORE=supabase python offload_transcripts.py [--batch-size 200]
+"""
+import argparse
+from database import get_supabase_client
+from transcript_store import blob_store, offload_transcript
+
+def offload(batch_size: int = 200) -> int:
+    """Offload inline transcripts in batches, returning the number of calls updated"""
+    if blob_store is None:
+        raise SystemExit("Set TRANSCRIPT_STORE to local or supabase first")
+    
+    supabase = get_supabase_client(use_service_role=True)
+    updated = 0
+    last_id = None
+    
+    while True:
+        query = supabase.table("calls").select("id, transcript").not_.is_("transcript", "null")
+        if last_id:
+            query = query.gt("id", last_id)
+        result = query.order("id").limit(batch_size).execute()
+        
+        rows = result.data or []
+        if not rows:
+            break
+        
+        for row in rows:
+            columns = offload_transcript(row["transcript"])
+            # Transcripts under TRANSCRIPT_OFFLOAD_MIN_BYTES only get their size recorded
+            supabase.table("calls").update(columns).eq("id", row["id"]).execute()
+            if columns["transcript_ref"]:
+                updated += 1
+        
+        # Short transcripts stay inline, so page by id
+        last_id = rows[-1]["id"]
+        print(f"Offloaded {updated} transcripts")
+    
+    return updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline call transcripts to the blob store")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    offload(args.batch_size)
@@ -0,0 +1,177 @@
+
+import base64
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+from fastapi import HTTPException, Query
+from fastapi.responses import Response
+from typing import Optional, List, Dict, Any, Tuple, Callable
+from database import execute_query, or_filter
+
+# Page size limits for /list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("LIST_DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "1000"))
+
+# Seconds a client may reuse a /list response before revalidating it with If-None-Match; 0 means always revalidate
+LIST_CACHE_MAX_AGE_SECONDS = int(os.getenv("LIST_CACHE_MAX_AGE_SECONDS", "0"))
+VOICES_LIST_CACHE_MAX_AGE_SECONDS = int(os.getenv("VOICES_LIST_CACHE_MAX_AGE_SECONDS", "60"))
+
+# Columns that may be requested through `fields=`; embedded resources are not allowed
+TABLE_COLUMNS = {
+    "agents": {
+        "id", "user_id", "name", "voice", "status", "description", "system_prompt", "first_message",
+        "knowledge_base_id", "script_id", "company", "conversations", "last_active", "gender", "languages",
+        "created_at", "updated_at"
+    },
+    "campaigns": {
+        "id", "user_id", "name", "description", "agent_id", "script_id", "knowledge_base_id", "status",
+        "settings", "campaign_type", "extracted_data_config", "created_at", "updated_at"
+    },
+    "contacts": {
+        "id", "user_id", "name", "email", "phone", "phone_normalized", "address", "city", "state", "zip_code",
+        "status", "last_called", "created_at", "updated_at"
+    },
+    "scripts": {
+        "id", "user_id", "name", "description", "company", "first_message", "sections", "created_at", "updated_at"
+    },
+    "custom_voices": {
+        "id", "user_id", "voice_name", "voice_id", "created_at", "updated_at"
+    },
+    "knowledge_base": {
+        "id", "user_id", "title", "type", "description", "content", "tags", "status", "date_added",
+        "last_modified", "created_at", "updated_at"
+    }
+}
+
+# Keyset columns; always selected so the next cursor can be built
+CURSOR_COLUMNS = ["created_at", "id"]
+
+class ListParams:
+    """Query parameters shared by the /list endpoints"""
+    
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+        include_count: bool = Query(False, description="Also return the total number of rows")
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = fields
+        self.include_count = include_count
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just after row"""
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor into its (created_at, id) keyset position.
+    
+    Both values end up in a raw or=(...) filter, so anything but a timestamp and a uuid is rejected."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, row_id
+
+def select_columns(table: str, fields: Optional[str]) -> List[str]:
+    """Validate a `fields=` projection, adding the keyset columns"""
+    if not fields:
+        return ["*"]
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in TABLE_COLUMNS[table]]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    return list(dict.fromkeys(requested + CURSOR_COLUMNS))
+
+async def fetch_page(supabase, table: str, user_id: str, params: ListParams) -> Dict[str, Any]:
+    """Fetch one page of a user's rows, newest first, using (created_at, id) keyset pagination"""
+    columns = select_columns(table, params.fields)
+    query = supabase.table(table).select(*columns, count="exact" if params.include_count else None).eq("user_id", user_id)
+    
+    if params.cursor:
+        created_at, row_id = decode_cursor(params.cursor)
+        query = or_filter(query, f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")')
+    
+    # One order parameter: created_at.desc,id.desc
+    result = await execute_query(query.order("created_at.desc,id", desc=True).limit(params.limit + 1))
+    
+    rows = result.data or []
+    has_more = len(rows) > params.limit
+    rows = rows[:params.limit]
+    
+    return {
+        "rows": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+        "total_count": result.count if params.include_count else None
+    }
+
+async def collection_version(supabase, table: str, user_id: str) -> str:
+    """Row count and newest updated_at of a user's rows; changes whenever a row is added, edited or deleted"""
+    result = await execute_query(
+        supabase.table(table).select("updated_at", count="exact").eq("user_id", user_id)
+        .order("updated_at.desc.nullslast").limit(1)
+    )
+    latest = result.data[0]["updated_at"] if result.data else None
+    return f"{result.count or 0}:{latest}"
+
+def list_etag(table: str, user_id: str, version: str, params: ListParams) -> str:
+    """Strong ETag for one page of a user's collection at a given version"""
+    key = json.dumps([table, user_id, version, params.cursor, params.limit, params.fields, params.include_count])
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The If-None-Match tag that matches etag, if any; tags suffixed by the compression middleware match their base tag"""
+    if not if_none_match:
+        return None
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        tag = candidate[2:] if candidate.startswith("W/") else candidate
+        for suffix in ("-gzip\"", "-br\""):
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+        if tag == etag:
+            return candidate
+    return None
+
+def cache_control(max_age: int) -> str:
+    if max_age > 0:
+        return f"private, max-age={max_age}, must-revalidate"
+    return "private, no-cache"
+
+async def conditional_page(
+    supabase,
+    table: str,
+    user_id: str,
+    params: ListParams,
+    if_none_match: Optional[str],
+    render: Callable[[Dict[str, Any]], Response],
+    max_age: int = LIST_CACHE_MAX_AGE_SECONDS
+) -> Response:
+    """Serve a /list page with an ETag; a matching If-None-Match gets a 304 without fetching or serializing the page.
+    
+    The version is read before the page, so a write in between only makes the next poll refetch."""
+    version = await collection_version(supabase, table, user_id)
+    headers = {
+        "ETag": list_etag(table, user_id, version, params),
+        "Cache-Control": cache_control(max_age),
+        "Vary": "Authorization"
+    }
+    matched = matching_etag(if_none_match, headers["ETag"])
+    if matched:
+        # Echo the tag the client holds, which may carry a content-encoding suffix
+        return Response(status_code=304, headers={**headers, "ETag": matched})
+    
+    response = render(await fetch_page(supabase, table, user_id, params))
+    response.headers.update(headers)
+    return response
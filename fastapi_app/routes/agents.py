@@ -2,7 +2,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from postgrest.exceptions import APIError
+from database import get_supabase_client, execute_query, authenticate_user, phone_lookup_key
+from pagination import ListParams, conditional_page
+from serialization import json_response, model_response
+from agent_routing import agent_routing, assign_phone_numbers, normalize_phone_numbers
 
 router = APIRouter()
 
@@ -16,13 +20,26 @@ class AgentCreate(BaseModel):
     knowledge_base_id: Optional[str] = None
     company: Optional[str] = None
     agent_type: Optional[str] = "outbound"
+    phone_numbers: Optional[List[str]] = None
+
+class PhoneNumbersRequest(BaseModel):
+    phone_numbers: List[str]
 
 class AgentResponse(BaseModel):
     success: bool
     agent: Optional[Dict[str, Any]] = None
     agents: Optional[List[Dict[str, Any]]] = None
+    phone_numbers: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
     error: Optional[str] = None
 
+def _phone_number_error(e: Exception) -> HTTPException:
+    # Unique index on phone_normalized: the number already routes to an agent
+    if isinstance(e, APIError) and e.code == "23505":
+        return HTTPException(status_code=409, detail="Phone number is already assigned to an agent")
+    return HTTPException(status_code=400, detail=str(e))
+
 @router.post("/create", response_model=AgentResponse)
 async def create_agent(
     agent_data: AgentCreate,
@@ -35,7 +52,13 @@ async def create_agent(
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("agents").insert({
+        # Rejected numbers fail the request before anything is written
+        normalize_phone_numbers(agent_data.phone_numbers or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await execute_query(supabase.table("agents").insert({
             "user_id": user["id"],
             "name": agent_data.name,
             "voice": agent_data.voice,
@@ -47,14 +70,27 @@ async def create_agent(
             "company": agent_data.company,
             "agent_type": agent_data.agent_type,
             "conversations": 0
-        }).select().single().execute()
+        }))
         
-        return AgentResponse(success=True, agent=result.data)
+        agent = result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        phone_numbers = await assign_phone_numbers(supabase, agent, agent_data.phone_numbers or [])
+    except Exception as e:
+        # An agent without the numbers it was created with is not created at all
+        await execute_query(supabase.table("agents").delete().eq("id", agent["id"]))
+        raise _phone_number_error(e)
+    
+    return model_response(AgentResponse, success=True, agent=agent, phone_numbers=phone_numbers)
 
 @router.get("/list", response_model=AgentResponse)
-async def list_agents(authorization: str = Header(..., alias="Authorization")):
+async def list_agents(
+    authorization: str = Header(..., alias="Authorization"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -62,39 +98,102 @@ async def list_agents(authorization: str = Header(..., alias="Authorization")):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("agents").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return AgentResponse(success=True, agents=result.data)
+        return await conditional_page(
+            supabase, "agents", user["id"], params, if_none_match,
+            lambda page: model_response(AgentResponse, success=True, agents=page["rows"], next_cursor=page["next_cursor"], total_count=page["total_count"])
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/by-number")
 async def get_agent_by_number(number: str):
-    supabase = get_supabase_client()
+    supabase = get_supabase_client(use_service_role=True)
     
     try:
-        # Query agents by name or ID containing the number
-        result = supabase.table("agents").select("*").or_(f"name.ilike.%{number}%,id.eq.{number}").limit(1).execute()
+        # Answered from the in-memory routing table; only the first request after startup may wait for the load
+        await agent_routing.ensure_loaded(supabase)
+        agent = agent_routing.lookup(number)
         
-        if not result.data:
+        if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        agent = result.data[0]
-        return {
-            "success": True,
-            "agent": {
-                "id": agent["id"],
-                "name": agent["name"],
-                "voice": agent["voice"],
-                "status": agent["status"],
-                "description": agent["description"],
-                "conversations": agent["conversations"],
-                "last_active": agent["last_active"],
-                "system_prompt": agent["system_prompt"],
-                "first_message": agent["first_message"],
-                "knowledge_base_id": agent["knowledge_base_id"],
-                "created_at": agent["created_at"],
-                "updated_at": agent["updated_at"]
-            }
-        }
+        return json_response({"success": True, "agent": agent})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _get_own_agent(supabase, agent_id: str, user_id: str) -> Dict[str, Any]:
+    result = await execute_query(supabase.table("agents").select("id, user_id").eq("id", agent_id).eq("user_id", user_id).limit(1))
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return result.data[0]
+
+@router.get("/{agent_id}/phone-numbers", response_model=AgentResponse)
+async def list_agent_phone_numbers(
+    agent_id: str,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        result = await execute_query(
+            supabase.table("agent_phone_numbers").select("*").eq("agent_id", agent_id).eq("user_id", user["id"]).order("created_at")
+        )
+        return model_response(AgentResponse, success=True, phone_numbers=result.data or [])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{agent_id}/phone-numbers", response_model=AgentResponse)
+async def add_agent_phone_numbers(
+    agent_id: str,
+    request: PhoneNumbersRequest,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        agent = await _get_own_agent(supabase, agent_id, user["id"])
+        phone_numbers = await assign_phone_numbers(supabase, agent, request.phone_numbers)
+        return model_response(AgentResponse, success=True, phone_numbers=phone_numbers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _phone_number_error(e)
+
+@router.delete("/{agent_id}/phone-numbers/{phone_number}", response_model=AgentResponse)
+async def remove_agent_phone_number(
+    agent_id: str,
+    phone_number: str,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        result = await execute_query(
+            supabase.table("agent_phone_numbers").delete()
+            .eq("agent_id", agent_id).eq("user_id", user["id"]).eq("phone_normalized", phone_lookup_key(phone_number))
+        )
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Phone number not found")
+        
+        agent_routing.remove_number(phone_number)
+        return model_response(AgentResponse, success=True, phone_numbers=result.data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,95 +1,161 @@
 
-from fastapi import APIRouter, HTTPException
-from typing import Optional, Dict, Any
+import os
+import re
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Tuple
 from pydantic import BaseModel
-from datetime import datetime
-from database import get_supabase_client, normalize_phone_number
+from database import get_supabase_client, execute_query, authenticate_user
+from call_ingest import CallData, ingest_calls, call_write_buffer
+from transcript_store import load_transcript_blob, iter_transcript_range
+from call_queue import call_queue, QueueFullError
 
 router = APIRouter()
 
-class CallData(BaseModel):
-    phone: str
-    duration: Optional[int] = None
-    status: Optional[str] = None
-    direction: Optional[str] = "outbound"
-    recording_url: Optional[str] = None
-    transcript: Optional[str] = None
-    call_id: Optional[str] = None
-    started_at: Optional[str] = None
-    ended_at: Optional[str] = None
-    notes: Optional[str] = None
-    campaign_id: Optional[str] = None
-    outcome: Optional[str] = None
-    sentiment: Optional[float] = None
-    user_id: Optional[str] = None
-    extracted_data: Optional[Dict[str, Any]] = None
-    call_status: Optional[str] = "completed"
-    rescheduled_for: Optional[str] = None
-    objective_met: Optional[bool] = None
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Maximum number of calls accepted by the batch endpoint
+CALL_DATA_BATCH_MAX_SIZE = int(os.getenv("CALL_DATA_BATCH_MAX_SIZE", "1000"))
+
+# Seconds a client should wait before retrying when the durable queue is full
+CALL_QUEUE_RETRY_AFTER_SECONDS = int(os.getenv("CALL_QUEUE_RETRY_AFTER_SECONDS", "5"))
+
+class CallDataBatch(BaseModel):
+    calls: List[CallData]
 
 @router.post("/receive-call-data")
 async def receive_call_data(call_data: CallData):
     supabase = get_supabase_client(use_service_role=True)
     
     try:
-        # Find contact by phone number
-        normalized_phone = normalize_phone_number(call_data.phone)
-        contacts_result = supabase.table("contacts").select("*").execute()
+        # Coalesce with other in-flight posts when the write buffer is enabled
+        if call_write_buffer:
+            result = await call_write_buffer.submit(call_data)
+        else:
+            result = (await ingest_calls(supabase, [call_data]))[0]
         
-        contact = None
-        for c in contacts_result.data:
-            if c["phone"] and normalize_phone_number(c["phone"]) == normalized_phone:
-                contact = c
-                break
+        if not result["success"]:
+            raise HTTPException(status_code=result["status_code"], detail=result["error"])
         
-        if not contact:
-            raise HTTPException(status_code=404, detail="Contact not found")
+        return result
         
-        # Update contact's last_called timestamp
-        now = datetime.utcnow().isoformat()
-        supabase.table("contacts").update({
-            "last_called": call_data.ended_at or call_data.started_at or now,
-            "updated_at": now
-        }).eq("id", contact["id"]).execute()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/receive-call-data/batch")
+async def receive_call_data_batch(batch: CallDataBatch):
+    if len(batch.calls) > CALL_DATA_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {CALL_DATA_BATCH_MAX_SIZE} calls")
+    
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        results = await ingest_calls(supabase, batch.calls) if batch.calls else []
+        stored = sum(1 for result in results if result["success"])
         
-        # Store call record
-        call_record = {
-            "contact_id": contact["id"],
-            "campaign_id": call_data.campaign_id,
-            "phone": call_data.phone,
-            "duration": call_data.duration,
-            "status": call_data.status or "unknown",
-            "direction": call_data.direction,
-            "recording_url": call_data.recording_url,
-            "transcript": call_data.transcript,
-            "external_call_id": call_data.call_id,
-            "started_at": call_data.started_at or now,
-            "ended_at": call_data.ended_at,
-            "notes": call_data.notes,
-            "outcome": call_data.outcome,
-            "sentiment": call_data.sentiment,
-            "user_id": call_data.user_id or contact["user_id"],
-            "extracted_data": call_data.extracted_data,
-            "call_status": call_data.call_status,
-            "rescheduled_for": call_data.rescheduled_for,
-            "objective_met": call_data.objective_met,
-            "created_at": now,
-            "updated_at": now
+        return {
+            "success": True,
+            "received": len(results),
+            "stored": stored,
+            "failed": len(results) - stored,
+            "results": results
         }
         
-        call_result = supabase.table("calls").insert(call_record).select().single().execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/receive-call-data/queued", status_code=202)
+async def receive_call_data_queued(call_data: CallData):
+    try:
+        # Accepted once fsynced to the local queue; the queue worker writes it to Supabase
+        queued = await call_queue.enqueue(call_data)
         
         return {
             "success": True,
-            "message": "Call data received and stored successfully",
-            "campaign_id": call_data.campaign_id,
-            "contact": {
-                "id": contact["id"],
-                "name": contact["name"],
-                "phone": contact["phone"]
-            },
-            "call_id": call_result.data["id"]
+            "queued": True,
+            "queue_id": queued["queue_id"],
+            "duplicate": queued["duplicate"]
         }
         
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(CALL_QUEUE_RETRY_AFTER_SECONDS)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue-stats")
+async def get_queue_stats():
+    return call_queue.stats()
+
+@router.get("/buffer-stats")
+async def get_buffer_stats():
+    return call_write_buffer.stats() if call_write_buffer else {"enabled": False}
+
+def _byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single-range Range header; None serves the whole body"""
+    match = _BYTE_RANGE.match(range_header.strip()) if range_header else None
+    # Multiple or malformed ranges may be ignored
+    if not match or match.groups() == ("", ""):
+        return None
+    
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@router.get("/{call_id}/transcript")
+async def get_call_transcript(
+    call_id: str,
+    authorization: str = Header(..., alias="Authorization"),
+    range_header: Optional[str] = Header(None, alias="Range")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        result = await execute_query(
+            supabase.table("calls").select("transcript, transcript_ref, transcript_bytes").eq("id", call_id).eq("user_id", user["id"]).limit(1)
+        )
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Call not found")
+        call = result.data[0]
+        
+        headers = {"Accept-Ranges": "bytes"}
+        if call["transcript_ref"]:
+            # Offloaded transcripts are decompressed while streaming, only as far as the range needs
+            ref = call["transcript_ref"]
+            blob = await load_transcript_blob(ref)
+            size = call["transcript_bytes"]
+            read = lambda start, end: iter_transcript_range(ref, blob, start, end)
+            headers["ETag"] = f'"{ref.rsplit("/", 1)[-1]}"'
+        elif call["transcript"] is not None:
+            data = call["transcript"].encode()
+            size = len(data)
+            read = lambda start, end: iter([data[start:end + 1]])
+        else:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+        
+        byte_range = _byte_range(range_header, size)
+        start, end = byte_range or (0, size - 1)
+        headers["Content-Length"] = str(end + 1 - start)
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        
+        return StreamingResponse(
+            read(start, end),
+            status_code=206 if byte_range else 200,
+            media_type="text/plain; charset=utf-8",
+            headers=headers
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,155 +1,165 @@
 
+import asyncio
+import os
+import time
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, Dict, Any
-from database import get_supabase_client, normalize_phone_number
+from typing import List, Dict, Any, Awaitable
+from database import get_supabase_client, execute_query, find_contact_by_phone
+from campaign_context import fetch_row, get_campaign_context, get_active_campaign_context
+from kb_index import knowledge_base_ref, search_knowledge_base
+from serialization import json_response
 
 router = APIRouter()
 
+# Total time allowed for resolving call details while the caller waits on the line
+CALL_DETAILS_BUDGET_MS = float(os.getenv("CALL_DETAILS_BUDGET_MS", "1500"))
+
+async def _timed(timings: Dict[str, float], stage: str, awaitable: Awaitable[Any]) -> Any:
+    """Await a lookup and record how long it took in milliseconds"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = (time.perf_counter() - started) * 1000
+
+async def _within_budget(awaitable: Awaitable[Any], started: float) -> Any:
+    """Await lookups, failing once the call-details latency budget is used up"""
+    remaining = CALL_DETAILS_BUDGET_MS / 1000 - (time.perf_counter() - started)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(remaining, 0))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Call details lookup exceeded the latency budget")
+
+def _knowledge_bases(context: Dict[str, Any], include_content: bool) -> List[Dict[str, Any]]:
+    """Full knowledge base rows, or compact references the agent can search on demand"""
+    if include_content:
+        return context["knowledge_bases"]
+    return [knowledge_base_ref(knowledge_base) for knowledge_base in context["knowledge_bases"]]
+
+def _server_timing(timings: Dict[str, float], started: float) -> Dict[str, str]:
+    """Per-stage timings as a Server-Timing header"""
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return {"Server-Timing": ", ".join(
+        f"{stage};dur={duration:.1f}" for stage, duration in timings.items()
+    )}
+
 @router.get("/caller-details")
 async def get_caller_details(
     phone: str = Query(...),
-    campaign_type: Optional[str] = Query(None)
+    campaign_type: str = Query("inbound"),
+    include_kb_content: bool = Query(False)
 ):
     supabase = get_supabase_client(use_service_role=True)
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
     
     try:
         # Find contact by phone
-        normalized_phone = normalize_phone_number(phone)
-        contacts_result = supabase.table("contacts").select("*").execute()
-        
-        contact = None
-        for c in contacts_result.data:
-            if c["phone"] and normalize_phone_number(c["phone"]) == normalized_phone:
-                contact = c
-                break
+        contact = await _within_budget(_timed(timings, "contact", find_contact_by_phone(supabase, phone)), started)
         
         if not contact:
             raise HTTPException(status_code=404, detail="Contact not found")
         
-        # Find active inbound campaign for this user
-        campaigns_result = supabase.table("campaigns").select("*").eq("user_id", contact["user_id"]).eq("status", "active").execute()
-        
-        campaign = None
-        for c in campaigns_result.data:
-            settings = c.get("settings", {})
-            if settings.get("campaign_type") == "inbound":
-                campaign = c
-                break
-        
-        if not campaign:
-            raise HTTPException(status_code=404, detail="No active inbound campaigns found for this contact")
-        
-        # Get agent, script, and user details
-        agent = None
-        if campaign.get("agent_id"):
-            agent_result = supabase.table("agents").select("*").eq("id", campaign["agent_id"]).single().execute()
-            if agent_result.data:
-                agent = agent_result.data
-        
-        script = None
-        if campaign.get("script_id"):
-            script_result = supabase.table("scripts").select("*").eq("id", campaign["script_id"]).single().execute()
-            if script_result.data:
-                script = script_result.data
-        
-        user_profile = None
-        user_result = supabase.table("profiles").select("*").eq("id", contact["user_id"]).single().execute()
-        if user_result.data:
-            user_profile = user_result.data
-        
-        # Get knowledge base
-        knowledge_bases = []
-        if campaign.get("knowledge_base_id"):
-            kb_result = supabase.table("knowledge_base").select("*").eq("id", campaign["knowledge_base_id"]).eq("status", "published").single().execute()
-            if kb_result.data:
-                knowledge_bases = [kb_result.data]
-        
-        return {
+        # The profile only depends on the contact, so fetch it while resolving the campaign
+        profile_task = asyncio.ensure_future(_timed(timings, "profile", fetch_row(supabase, "profiles", contact["user_id"])))
+        
+        try:
+            # Active campaign of the requested type with its agent, script and knowledge base, from the campaign context cache
+            context = await _within_budget(_timed(timings, "campaign_context", get_active_campaign_context(supabase, contact["user_id"], campaign_type)), started)
+            
+            if not context:
+                raise HTTPException(status_code=404, detail=f"No active {campaign_type} campaigns found for this contact")
+            
+            user_profile = await _within_budget(profile_task, started)
+        finally:
+            profile_task.cancel()
+        
+        return json_response({
             "success": True,
-            "campaign": campaign,
+            "campaign": context["campaign"],
             "contact": contact,
-            "agent": agent,
-            "script": script,
+            "agent": context["agent"],
+            "script": context["script"],
             "user": user_profile,
-            "knowledge_bases": knowledge_bases
-        }
+            "knowledge_bases": _knowledge_bases(context, include_kb_content)
+        }, headers=_server_timing(timings, started))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/outbound-call-details")
 async def get_outbound_call_details(
     campaign_id: str = Query(...),
-    phone: str = Query(...)
+    phone: str = Query(...),
+    include_kb_content: bool = Query(False)
 ):
     supabase = get_supabase_client(use_service_role=True)
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
     
     try:
-        # Get campaign
-        campaign_result = supabase.table("campaigns").select("*").eq("id", campaign_id).single().execute()
-        if not campaign_result.data:
-            raise HTTPException(status_code=404, detail="Campaign not found")
+        # Get the campaign context snapshot and find contact by phone concurrently
+        context, contact = await _within_budget(asyncio.gather(
+            _timed(timings, "campaign_context", get_campaign_context(supabase, campaign_id)),
+            _timed(timings, "contact", find_contact_by_phone(supabase, phone))
+        ), started)
         
-        campaign = campaign_result.data
-        
-        # Find contact by phone
-        normalized_phone = normalize_phone_number(phone)
-        contacts_result = supabase.table("contacts").select("*").execute()
-        
-        contact = None
-        for c in contacts_result.data:
-            if c["phone"] and normalize_phone_number(c["phone"]) == normalized_phone:
-                contact = c
-                break
+        if not context:
+            raise HTTPException(status_code=404, detail="Campaign not found")
         
         if not contact:
             raise HTTPException(status_code=404, detail="Contact not found")
         
-        # Verify contact is in campaign
-        campaign_contact_result = supabase.table("campaign_contacts").select("*").eq("campaign_id", campaign_id).eq("contact_id", contact["id"]).single().execute()
+        # Only the contact-specific part is resolved per call
+        campaign_contact_result, contact_user = await _within_budget(asyncio.gather(
+            _timed(timings, "campaign_contact", execute_query(
+                supabase.table("campaign_contacts").select("id").eq("campaign_id", campaign_id).eq("contact_id", contact["id"]).limit(1)
+            )),
+            _timed(timings, "profile", fetch_row(supabase, "profiles", contact["user_id"]))
+        ), started)
         
         if not campaign_contact_result.data:
             raise HTTPException(status_code=404, detail="Contact not found in the specified campaign")
         
-        # Get agent details
-        agent = None
-        if campaign.get("agent_id"):
-            agent_result = supabase.table("agents").select("*").eq("id", campaign["agent_id"]).single().execute()
-            if agent_result.data:
-                agent = agent_result.data
-        
-        if not agent:
+        if not context["agent"]:
             raise HTTPException(status_code=404, detail="No agent assigned to this outbound campaign")
         
-        # Get script details
-        script = None
-        if campaign.get("script_id"):
-            script_result = supabase.table("scripts").select("*").eq("id", campaign["script_id"]).single().execute()
-            if script_result.data:
-                script = script_result.data
-        
-        # Get user profile
-        contact_user = None
-        user_result = supabase.table("profiles").select("*").eq("id", contact["user_id"]).single().execute()
-        if user_result.data:
-            contact_user = user_result.data
-        
-        # Get knowledge bases
-        knowledge_bases = []
-        if campaign.get("knowledge_base_id"):
-            kb_result = supabase.table("knowledge_base").select("*").eq("id", campaign["knowledge_base_id"]).eq("status", "published").single().execute()
-            if kb_result.data:
-                knowledge_bases = [kb_result.data]
-        
-        return {
+        return json_response({
             "success": True,
-            "campaign": campaign,
-            "agent": agent,
-            "script": script,
+            "campaign": context["campaign"],
+            "agent": context["agent"],
+            "script": context["script"],
             "contact_user": contact_user,
-            "knowledge_bases": knowledge_bases,
+            "knowledge_bases": _knowledge_bases(context, include_kb_content),
             "contact": contact
-        }
+        }, headers=_server_timing(timings, started))
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/knowledge-search")
+async def search_knowledge(
+    knowledge_base_id: str = Query(...),
+    q: str = Query(..., min_length=1),
+    k: int = Query(5, ge=1)
+):
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        results = await search_knowledge_base(supabase, knowledge_base_id, q, k)
+        if results is None:
+            raise HTTPException(status_code=404, detail="Knowledge base not found")
+        
+        return json_response({
+            "success": True,
+            "knowledge_base_id": knowledge_base_id,
+            "results": results
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
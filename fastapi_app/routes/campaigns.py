@@ -1,23 +1,51 @@
 
-from fastapi import APIRouter, HTTPException, Depends, Header
-from typing import Optional, List, Dict, Any
+import asyncio
+import csv
+import io
+import json
+import os
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Optional, List, Dict, Any, AsyncIterator
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user
+from pagination import ListParams, fetch_page
+from serialization import json_response, model_response
+from campaign_context import invalidate_campaign_context
+from campaign_stats import get_campaign_stats
+from campaign_enrollment import (
+    ContactFilter, enroll_contact_ids, create_enrollment, get_enrollment,
+    start_enrollment, is_enrollment_running
+)
 
 router = APIRouter()
 
+# Rows fetched per round trip when exporting extracted data
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+EXPORT_BASE_COLUMNS = ["call_id", "contact_name", "phone", "started_at", "duration", "status"]
+
 class CampaignCreate(BaseModel):
     name: str
     description: Optional[str] = None
     agent_id: Optional[str] = None
     contact_ids: Optional[List[str]] = []
+    contact_filter: Optional[ContactFilter] = None
     status: Optional[str] = "draft"
     knowledge_base_id: Optional[str] = None
 
+class EnrollmentRequest(BaseModel):
+    contact_ids: Optional[List[str]] = []
+    contact_filter: Optional[ContactFilter] = None
+
 class CampaignResponse(BaseModel):
     success: bool
     campaign: Optional[Dict[str, Any]] = None
+    enrolled: Optional[int] = None
+    enrollment: Optional[Dict[str, Any]] = None
     campaigns: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
     error: Optional[str] = None
 
 @router.post("/create", response_model=CampaignResponse)
@@ -32,31 +60,149 @@ async def create_campaign(
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        # Create campaign
-        result = supabase.table("campaigns").insert({
+        # Create campaign; membership lives only in campaign_contacts
+        result = await execute_query(supabase.table("campaigns").insert({
             "user_id": user["id"],
             "name": campaign_data.name,
             "description": campaign_data.description,
             "agent_id": campaign_data.agent_id,
-            "contact_ids": campaign_data.contact_ids,
             "status": campaign_data.status,
             "knowledge_base_id": campaign_data.knowledge_base_id
-        }).select().single().execute()
+        }))
+        campaign = result.data[0]
         
-        # Create campaign_contacts entries if contact_ids provided
-        if campaign_data.contact_ids:
-            campaign_contacts = [
-                {"campaign_id": result.data["id"], "contact_id": contact_id}
-                for contact_id in campaign_data.contact_ids
-            ]
-            supabase.table("campaign_contacts").insert(campaign_contacts).execute()
+        # Enroll listed contacts in sized batches
+        enrolled = await enroll_contact_ids(supabase, campaign["id"], campaign_data.contact_ids) if campaign_data.contact_ids else 0
+        
+        # Contacts matching a filter are enrolled in the background with resumable progress
+        enrollment = None
+        if campaign_data.contact_filter:
+            enrollment = await create_enrollment(supabase, campaign["id"], user["id"], campaign_data.contact_filter)
+            start_enrollment(supabase, enrollment)
+        
+        # A new campaign may become the user's active campaign of its type
+        invalidate_campaign_context(user_id=user["id"])
         
-        return CampaignResponse(success=True, campaign=result.data)
+        return model_response(CampaignResponse, success=True, campaign=campaign, enrolled=enrolled, enrollment=enrollment)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{campaign_id}/enroll", response_model=CampaignResponse)
+async def enroll_campaign_contacts(
+    campaign_id: str,
+    request: EnrollmentRequest,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        campaign_result = await execute_query(supabase.table("campaigns").select("id").eq("id", campaign_id).eq("user_id", user["id"]).limit(1))
+        if not campaign_result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        
+        enrolled = await enroll_contact_ids(supabase, campaign_id, request.contact_ids) if request.contact_ids else 0
+        
+        enrollment = None
+        if request.contact_filter:
+            enrollment = await create_enrollment(supabase, campaign_id, user["id"], request.contact_filter)
+            start_enrollment(supabase, enrollment)
+        
+        return model_response(CampaignResponse, success=True, enrolled=enrolled, enrollment=enrollment)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{campaign_id}/stats")
+async def get_campaign_call_stats(
+    campaign_id: str,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    group_by: Optional[str] = Query(None, pattern="^(day|agent_id)$"),
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        # Stats come from the per-day rollups, so their cost does not grow with the number of calls
+        campaign_result, stats = await asyncio.gather(
+            execute_query(supabase.table("campaigns").select("id").eq("id", campaign_id).eq("user_id", user["id"]).limit(1)),
+            get_campaign_stats(supabase, campaign_id, user["id"], start, end, group_by)
+        )
+        if not campaign_result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        
+        return json_response({"success": True, "campaign_id": campaign_id, **stats})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/enrollments/{enrollment_id}", response_model=CampaignResponse)
+async def get_campaign_enrollment(
+    enrollment_id: str,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        enrollment = await get_enrollment(supabase, enrollment_id, user["id"])
+        if not enrollment:
+            raise HTTPException(status_code=404, detail="Enrollment not found")
+        
+        return model_response(CampaignResponse, success=True, enrollment=enrollment)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/enrollments/{enrollment_id}/resume", response_model=CampaignResponse)
+async def resume_campaign_enrollment(
+    enrollment_id: str,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        enrollment = await get_enrollment(supabase, enrollment_id, user["id"])
+        if not enrollment:
+            raise HTTPException(status_code=404, detail="Enrollment not found")
+        
+        if enrollment["status"] == "completed":
+            raise HTTPException(status_code=409, detail="Enrollment already completed")
+        
+        if is_enrollment_running(enrollment_id):
+            raise HTTPException(status_code=409, detail="Enrollment is already running")
+        
+        # Continues after last_contact_id
+        start_enrollment(supabase, enrollment)
+        return model_response(CampaignResponse, success=True, enrollment=enrollment)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/list", response_model=CampaignResponse)
-async def list_campaigns(authorization: str = Header(..., alias="Authorization")):
+async def list_campaigns(
+    authorization: str = Header(..., alias="Authorization"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -64,46 +210,112 @@ async def list_campaigns(authorization: str = Header(..., alias="Authorization")
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("campaigns").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return CampaignResponse(success=True, campaigns=result.data)
+        page = await fetch_page(supabase, "campaigns", user["id"], params)
+        return model_response(CampaignResponse, success=True, campaigns=page["rows"], next_cursor=page["next_cursor"], total_count=page["total_count"])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _iter_extracted_data_pages(supabase, campaign_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield a campaign's calls with extracted data page by page, keyed on call id"""
+    last_id = None
+    while True:
+        query = supabase.table("calls").select(
+            "id, phone, started_at, duration, status, extracted_data, contacts!inner(name)"
+        ).eq("campaign_id", campaign_id).not_.is_("extracted_data", "null")
+        if last_id:
+            query = query.gt("id", last_id)
+        result = await execute_query(query.order("id").limit(EXPORT_PAGE_SIZE))
+        
+        calls = result.data or []
+        if calls:
+            yield [
+                {
+                    "call_id": call["id"],
+                    "contact_name": call["contacts"]["name"] if call["contacts"] else "Unknown",
+                    "phone": call["phone"],
+                    "started_at": call["started_at"],
+                    "duration": call["duration"] or 0,
+                    "status": call["status"],
+                    "extracted_data": call["extracted_data"] or {}
+                }
+                for call in calls
+            ]
+        
+        if len(calls) < EXPORT_PAGE_SIZE:
+            return
+        last_id = calls[-1]["id"]
+
+def _csv_value(value: Any) -> Any:
+    """Flatten nested extracted values into a single CSV cell"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+async def _stream_ndjson(supabase, campaign_id: str) -> AsyncIterator[str]:
+    """Stream calls as newline-delimited JSON, one page per chunk"""
+    async for page in _iter_extracted_data_pages(supabase, campaign_id):
+        yield "".join(json.dumps(call) + "\n" for call in page)
+
+async def _stream_csv(supabase, campaign_id: str, field_names: List[str]) -> AsyncIterator[str]:
+    """Stream calls as CSV with one column per configured extraction field"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_BASE_COLUMNS + field_names)
+    
+    async for page in _iter_extracted_data_pages(supabase, campaign_id):
+        for call in page:
+            writer.writerow(
+                [call[column] for column in EXPORT_BASE_COLUMNS]
+                + [_csv_value(call["extracted_data"].get(name)) for name in field_names]
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
 @router.get("/extracted-data/{campaign_id}")
-async def get_campaign_extracted_data(campaign_id: str):
+async def get_campaign_extracted_data(
+    campaign_id: str,
+    format: str = Query("json", pattern="^(json|ndjson|csv)$")
+):
     supabase = get_supabase_client(use_service_role=True)
     
     try:
         # Get campaign
-        campaign_result = supabase.table("campaigns").select("id, name, extracted_data_config").eq("id", campaign_id).single().execute()
+        campaign_result = await execute_query(supabase.table("campaigns").select("id, name, extracted_data_config").eq("id", campaign_id).limit(1))
         
         if not campaign_result.data:
             raise HTTPException(status_code=404, detail="Campaign not found")
         
+        campaign = campaign_result.data[0]
+        extracted_data_config = campaign.get("extracted_data_config") or []
+        
+        # Streaming exports page through the calls so memory stays flat
+        if format == "ndjson":
+            return StreamingResponse(
+                _stream_ndjson(supabase, campaign_id),
+                media_type="application/x-ndjson",
+                headers={"Content-Disposition": f'attachment; filename="campaign-{campaign_id}.ndjson"'}
+            )
+        
+        if format == "csv":
+            field_names = [field["name"] for field in extracted_data_config if field.get("name")]
+            return StreamingResponse(
+                _stream_csv(supabase, campaign_id, field_names),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="campaign-{campaign_id}.csv"'}
+            )
+        
         # Get calls with extracted data
-        calls_result = supabase.table("calls").select("""
-            id, phone, started_at, duration, status, extracted_data,
-            contacts!inner(name)
-        """).eq("campaign_id", campaign_id).not_("extracted_data", "is", None).execute()
-        
-        campaign = campaign_result.data
-        calls = calls_result.data or []
-        
-        extracted_data_config = campaign.get("extracted_data_config", [])
-        call_data = [
-            {
-                "call_id": call["id"],
-                "contact_name": call["contacts"]["name"] if call["contacts"] else "Unknown",
-                "phone": call["phone"],
-                "started_at": call["started_at"],
-                "duration": call["duration"] or 0,
-                "status": call["status"],
-                "extracted_data": call["extracted_data"] or {}
-            }
-            for call in calls
-        ]
-        
-        return {
+        call_data = []
+        async for page in _iter_extracted_data_pages(supabase, campaign_id):
+            call_data.extend(page)
+        
+        return json_response({
             "campaign": {
                 "id": campaign["id"],
                 "name": campaign["name"],
@@ -112,6 +324,8 @@ async def get_campaign_extracted_data(campaign_id: str):
             "calls": call_data,
             "total_calls": len(call_data),
             "fields_configured": len(extracted_data_config)
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
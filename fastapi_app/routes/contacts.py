@@ -1,8 +1,13 @@
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import Optional, List, Dict, Any
+import json
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user, phone_lookup_key, invalidate_contact_phone
+from pagination import ListParams, fetch_page
+from serialization import model_response
+from contact_import import iter_import_rows, import_contacts
 
 router = APIRouter()
 
@@ -20,6 +25,8 @@ class ContactResponse(BaseModel):
     success: bool
     contact: Optional[Dict[str, Any]] = None
     contacts: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
     error: Optional[str] = None
 
 @router.post("/create", response_model=ContactResponse)
@@ -34,24 +41,29 @@ async def create_contact(
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("contacts").insert({
+        result = await execute_query(supabase.table("contacts").insert({
             "user_id": user["id"],
             "name": contact_data.name,
             "email": contact_data.email,
             "phone": contact_data.phone,
+            "phone_normalized": phone_lookup_key(contact_data.phone),
             "address": contact_data.address,
             "city": contact_data.city,
             "state": contact_data.state,
             "zip_code": contact_data.zip_code,
             "status": contact_data.status
-        }).select().single().execute()
+        }))
+        invalidate_contact_phone(contact_data.phone)
         
-        return ContactResponse(success=True, contact=result.data)
+        return model_response(ContactResponse, success=True, contact=result.data[0])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/list", response_model=ContactResponse)
-async def list_contacts(authorization: str = Header(..., alias="Authorization")):
+async def list_contacts(
+    authorization: str = Header(..., alias="Authorization"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -59,7 +71,38 @@ async def list_contacts(authorization: str = Header(..., alias="Authorization"))
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("contacts").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return ContactResponse(success=True, contacts=result.data)
+        page = await fetch_page(supabase, "contacts", user["id"], params)
+        return model_response(ContactResponse, success=True, contacts=page["rows"], next_cursor=page["next_cursor"], total_count=page["total_count"])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/import")
+async def import_contacts_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    on_duplicate: str = Query("skip", pattern="^(skip|update)$"),
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    # Fall back to the file extension when no format is given
+    file_format = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    
+    async def progress_stream():
+        try:
+            rows = iter_import_rows(file, file_format)
+            async for report in import_contacts(supabase, user["id"], rows, update_existing=on_duplicate == "update"):
+                yield json.dumps(report) + "\n"
+        except Exception as e:
+            yield json.dumps({"done": True, "success": False, "error": str(e)}) + "\n"
+        finally:
+            await file.close()
+    
+    # One NDJSON progress line per written batch, then a final summary
+    return StreamingResponse(progress_stream(), media_type="application/x-ndjson")
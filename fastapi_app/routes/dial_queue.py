@@ -0,0 +1,89 @@
+
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from pydantic import BaseModel, Field
+from database import get_supabase_client
+from dial_queue import (
+    DIAL_QUEUE_MAX_CLAIM, claim_dial_leases, extend_dial_lease,
+    complete_dial_lease, dial_queue_stats
+)
+
+router = APIRouter()
+
+class ClaimRequest(BaseModel):
+    campaign_id: str
+    worker_id: str
+    limit: int = Field(1, ge=1, le=DIAL_QUEUE_MAX_CLAIM)
+    lease_seconds: Optional[int] = Field(None, ge=10)
+
+class LeaseHeartbeat(BaseModel):
+    lease_token: str
+    lease_seconds: Optional[int] = Field(None, ge=10)
+
+class LeaseCompletion(BaseModel):
+    lease_token: str
+    outcome: str = Field(..., pattern="^(completed|retry|failed)$")
+    rescheduled_for: Optional[str] = None
+
+@router.post("/claim")
+async def claim_contacts(request: ClaimRequest):
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        leases = await claim_dial_leases(supabase, request.campaign_id, request.worker_id, request.limit, request.lease_seconds)
+        
+        return {
+            "success": True,
+            "leases": leases
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/leases/{lease_id}/heartbeat")
+async def heartbeat_lease(lease_id: str, request: LeaseHeartbeat):
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        lease = await extend_dial_lease(supabase, lease_id, request.lease_token, request.lease_seconds)
+        
+        if not lease:
+            raise HTTPException(status_code=409, detail="Lease expired or held by another worker")
+        
+        return {"success": True, "leased_until": lease["leased_until"]}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/leases/{lease_id}/complete")
+async def complete_lease(lease_id: str, request: LeaseCompletion):
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        lease = await complete_dial_lease(supabase, lease_id, request.lease_token, request.outcome, request.rescheduled_for)
+        
+        if not lease:
+            raise HTTPException(status_code=409, detail="Lease expired or held by another worker")
+        
+        return {
+            "success": True,
+            "dial_status": lease["dial_status"],
+            "next_dial_at": lease["next_dial_at"],
+            "attempts": lease["attempts"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{campaign_id}/stats")
+async def get_dial_queue_stats(campaign_id: str):
+    supabase = get_supabase_client(use_service_role=True)
+    
+    try:
+        return {"success": True, "campaign_id": campaign_id, "counts": await dial_queue_stats(supabase, campaign_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
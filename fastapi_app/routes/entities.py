@@ -1,11 +1,47 @@
 
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Header
 from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user, phone_lookup_key, invalidate_contact_phone
+from campaign_enrollment import enroll_contact_ids, enroll_memberships
+from campaign_context import invalidate_campaign_context
 
 router = APIRouter()
 
+# Most entities accepted by one /create-entities request
+ENTITY_BATCH_MAX_ITEMS = int(os.getenv("ENTITY_BATCH_MAX_ITEMS", "1000"))
+
+# Table per entity type, in batch insertion order: a type only references types listed before it
+ENTITY_TABLES = {
+    "knowledge_base": "knowledge_base",
+    "script": "scripts",
+    "contact": "contacts",
+    "agent": "agents",
+    "campaign": "campaigns"
+}
+
+# Fields an insert would fail without, checked per item so one bad item does not fail its table's insert
+REQUIRED_FIELDS = {
+    "knowledge_base": ["title"],
+    "script": ["name"],
+    "contact": ["name"],
+    "agent": ["name"],
+    "campaign": ["name"]
+}
+
+# Fields that may reference another item of the batch, and the entity type they must point to
+REFERENCE_FIELDS = {
+    "agent": {"knowledge_base_id": "knowledge_base"},
+    "campaign": {"agent_id": "agent", "knowledge_base_id": "knowledge_base", "script_id": "script"}
+}
+
+# Prefix marking a value as the ref of an item in the same batch, e.g. "agent_id": "$sales_agent"
+REF_PREFIX = "$"
+
 class EntityData(BaseModel):
     # Agent fields
     name: Optional[str] = None
@@ -32,14 +68,94 @@ class EntityData(BaseModel):
     content: Optional[str] = None
     tags: Optional[List[str]] = None
     
+    # Script fields
+    sections: Optional[List[Dict[str, Any]]] = []
+    
     # Campaign fields
     agent_id: Optional[str] = None
+    script_id: Optional[str] = None
     contact_ids: Optional[List[str]] = []
 
 class CreateEntityRequest(BaseModel):
     entityType: str
     data: EntityData
 
+class BatchEntity(BaseModel):
+    entityType: str
+    data: EntityData
+    # Name other items of the batch use to reference this one
+    ref: Optional[str] = None
+
+class CreateEntitiesRequest(BaseModel):
+    entities: List[BatchEntity]
+
+def build_entity_row(entity_type: str, data: EntityData, user_id: str, now: str) -> Dict[str, Any]:
+    """Row to insert into the entity type's table"""
+    if entity_type == "agent":
+        return {
+            "user_id": user_id,
+            "name": data.name,
+            "voice": data.voice,
+            "status": data.status,
+            "description": data.description,
+            "system_prompt": data.system_prompt,
+            "first_message": data.first_message,
+            "knowledge_base_id": data.knowledge_base_id,
+            "company": data.company,
+            "agent_type": data.agent_type,
+            "conversations": 0
+        }
+    
+    if entity_type == "contact":
+        return {
+            "user_id": user_id,
+            "name": data.name,
+            "email": data.email,
+            "phone": data.phone,
+            "phone_normalized": phone_lookup_key(data.phone),
+            "address": data.address,
+            "city": data.city,
+            "state": data.state,
+            "zip_code": data.zip_code,
+            "status": data.status or "active"
+        }
+    
+    if entity_type == "knowledge_base":
+        return {
+            "user_id": user_id,
+            "title": data.title,
+            "type": data.type,
+            "description": data.description,
+            "content": data.content,
+            "tags": data.tags,
+            "status": data.status or "draft",
+            "date_added": now,
+            "last_modified": now
+        }
+    
+    if entity_type == "script":
+        return {
+            "user_id": user_id,
+            "name": data.name,
+            "description": data.description,
+            "company": data.company,
+            "first_message": data.first_message,
+            "sections": data.sections
+        }
+    
+    if entity_type == "campaign":
+        return {
+            "user_id": user_id,
+            "name": data.name,
+            "description": data.description,
+            "agent_id": data.agent_id,
+            "script_id": data.script_id,
+            "status": data.status or "draft",
+            "knowledge_base_id": data.knowledge_base_id
+        }
+    
+    raise HTTPException(status_code=400, detail=f"Unsupported entity type: {entity_type}")
+
 @router.post("/create-entity")
 async def create_entity(
     request: CreateEntityRequest,
@@ -55,77 +171,188 @@ async def create_entity(
     data = request.data
     
     try:
-        if entity_type == "agent":
-            result = supabase.table("agents").insert({
-                "user_id": user["id"],
-                "name": data.name,
-                "voice": data.voice,
-                "status": data.status,
-                "description": data.description,
-                "system_prompt": data.system_prompt,
-                "first_message": data.first_message,
-                "knowledge_base_id": data.knowledge_base_id,
-                "company": data.company,
-                "agent_type": data.agent_type,
-                "conversations": 0
-            }).select().single().execute()
-            
-        elif entity_type == "contact":
-            result = supabase.table("contacts").insert({
-                "user_id": user["id"],
-                "name": data.name,
-                "email": data.email,
-                "phone": data.phone,
-                "address": data.address,
-                "city": data.city,
-                "state": data.state,
-                "zip_code": data.zip_code,
-                "status": data.status or "active"
-            }).select().single().execute()
-            
-        elif entity_type == "knowledge_base":
-            from datetime import datetime
-            now = datetime.utcnow().isoformat()
-            
-            result = supabase.table("knowledge_base").insert({
-                "user_id": user["id"],
-                "title": data.title,
-                "type": data.type,
-                "description": data.description,
-                "content": data.content,
-                "tags": data.tags,
-                "status": data.status or "draft",
-                "date_added": now,
-                "last_modified": now
-            }).select().single().execute()
-            
-        elif entity_type == "campaign":
-            result = supabase.table("campaigns").insert({
-                "user_id": user["id"],
-                "name": data.name,
-                "description": data.description,
-                "agent_id": data.agent_id,
-                "contact_ids": data.contact_ids,
-                "status": data.status or "draft",
-                "knowledge_base_id": data.knowledge_base_id
-            }).select().single().execute()
-            
-            # Create campaign_contacts entries if contact_ids provided
+        row = build_entity_row(entity_type, data, user["id"], datetime.utcnow().isoformat())
+        result = await execute_query(supabase.table(ENTITY_TABLES[entity_type]).insert(row))
+        
+        if entity_type == "contact":
+            invalidate_contact_phone(data.phone)
+        
+        # Enroll listed contacts in sized batches
+        if entity_type == "campaign":
             if data.contact_ids:
-                campaign_contacts = [
-                    {"campaign_id": result.data["id"], "contact_id": contact_id}
-                    for contact_id in data.contact_ids
-                ]
-                supabase.table("campaign_contacts").insert(campaign_contacts).execute()
-                
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported entity type: {entity_type}")
+                await enroll_contact_ids(supabase, result.data[0]["id"], data.contact_ids)
+            invalidate_campaign_context(user_id=user["id"])
         
         return {
             "success": True,
-            "data": result.data,
+            "data": result.data[0],
             "entityType": entity_type
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _resolve(
+    value: Optional[str],
+    expected_type: str,
+    entities: List[BatchEntity],
+    refs: Dict[str, int],
+    results: List[Optional[Dict[str, Any]]]
+) -> Union[Optional[str], Dict[str, str]]:
+    """Id for a field value, replacing a batch reference with the id created for it; returns {"error": ...} when it cannot"""
+    if not value or not value.startswith(REF_PREFIX):
+        return value
+    
+    index = refs.get(value[len(REF_PREFIX):])
+    if index is None:
+        return {"error": f"Unknown reference: {value}"}
+    if entities[index].entityType != expected_type:
+        return {"error": f"Reference {value} points to a {entities[index].entityType}, expected {expected_type}"}
+    if not results[index] or not results[index]["success"]:
+        return {"error": f"Referenced entity {value} was not created"}
+    return results[index]["data"]["id"]
+
+def _resolve_references(
+    entity: BatchEntity,
+    entities: List[BatchEntity],
+    refs: Dict[str, int],
+    results: List[Optional[Dict[str, Any]]]
+) -> Union[EntityData, str]:
+    """Entity data with batch references replaced by ids, or the error that prevents it"""
+    updates: Dict[str, Any] = {}
+    for field, expected_type in REFERENCE_FIELDS.get(entity.entityType, {}).items():
+        resolved = _resolve(getattr(entity.data, field), expected_type, entities, refs, results)
+        if isinstance(resolved, dict):
+            return resolved["error"]
+        updates[field] = resolved
+    
+    if entity.entityType == "campaign" and entity.data.contact_ids:
+        contact_ids = []
+        for contact_id in entity.data.contact_ids:
+            resolved = _resolve(contact_id, "contact", entities, refs, results)
+            if isinstance(resolved, dict):
+                return resolved["error"]
+            contact_ids.append(resolved)
+        updates["contact_ids"] = contact_ids
+    
+    return entity.data.model_copy(update=updates)
+
+async def _insert_one(supabase, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    result = await execute_query(supabase.table(table).insert(row))
+    return result.data[0]
+
+@router.post("/create-entities")
+async def create_entities(
+    request: CreateEntitiesRequest,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    entities = request.entities
+    if len(entities) > ENTITY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {ENTITY_BATCH_MAX_ITEMS} entities per request")
+    
+    try:
+        now = datetime.utcnow().isoformat()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(entities)
+        refs: Dict[str, int] = {}
+        for index, entity in enumerate(entities):
+            if entity.entityType not in ENTITY_TABLES:
+                results[index] = {"success": False, "error": f"Unsupported entity type: {entity.entityType}"}
+            elif entity.ref is not None and entity.ref in refs:
+                results[index] = {"success": False, "error": f"Duplicate ref: {entity.ref}"}
+            else:
+                missing = [field for field in REQUIRED_FIELDS[entity.entityType] if not getattr(entity.data, field)]
+                if missing:
+                    results[index] = {"success": False, "error": f"Missing required fields: {', '.join(missing)}"}
+            if entity.ref is not None and entity.ref not in refs:
+                refs[entity.ref] = index
+        
+        # One multi-row insert per table; types are inserted before the types that can reference them
+        memberships: Dict[int, List[Dict[str, str]]] = {}
+        for entity_type, table in ENTITY_TABLES.items():
+            indexes = []
+            rows = []
+            for index, entity in enumerate(entities):
+                if entity.entityType != entity_type or results[index] is not None:
+                    continue
+                data = _resolve_references(entity, entities, refs, results)
+                if isinstance(data, str):
+                    results[index] = {"success": False, "error": data}
+                    continue
+                indexes.append(index)
+                rows.append(build_entity_row(entity_type, data, user["id"], now))
+                if entity_type == "campaign" and data.contact_ids:
+                    memberships[index] = [{"contact_id": contact_id} for contact_id in dict.fromkeys(data.contact_ids)]
+            if not rows:
+                continue
+            
+            try:
+                # PostgREST returns inserted rows in request order
+                inserted = (await execute_query(supabase.table(table).insert(rows))).data
+            except Exception as e:
+                if len(rows) == 1:
+                    inserted = [e]
+                else:
+                    # One bad value fails the whole statement; insert row by row so only the offending items fail
+                    inserted = await asyncio.gather(
+                        *(_insert_one(supabase, table, row) for row in rows),
+                        return_exceptions=True
+                    )
+            
+            for index, created in zip(indexes, inserted):
+                if isinstance(created, Exception):
+                    results[index] = {"success": False, "error": getattr(created, "message", None) or str(created)}
+                    continue
+                results[index] = {"success": True, "data": created}
+                if entity_type == "contact":
+                    invalidate_contact_phone(entities[index].data.phone)
+            if entity_type == "campaign":
+                invalidate_campaign_context(user_id=user["id"])
+        
+        # Contacts listed by the created campaigns are enrolled together, in sized batches across campaigns
+        enrolled = [index for index in memberships if results[index]["success"]]
+        if enrolled:
+            try:
+                inserted = await enroll_memberships(supabase, [
+                    {"campaign_id": results[index]["data"]["id"], **membership}
+                    for index in enrolled for membership in memberships[index]
+                ])
+                counts = Counter(row["campaign_id"] for row in inserted)
+                for index in enrolled:
+                    results[index]["enrolled"] = counts[results[index]["data"]["id"]]
+            except Exception:
+                # A bad contact id fails the combined write; enroll campaign by campaign so only its campaign fails
+                outcomes = await asyncio.gather(
+                    *(enroll_memberships(supabase, [
+                        {"campaign_id": results[index]["data"]["id"], **membership} for membership in memberships[index]
+                    ]) for index in enrolled),
+                    return_exceptions=True
+                )
+                for index, outcome in zip(enrolled, outcomes):
+                    if isinstance(outcome, Exception):
+                        error = getattr(outcome, "message", None) or str(outcome)
+                        results[index] = {**results[index], "success": False, "error": f"Campaign created but enrolling contacts failed: {error}"}
+                    else:
+                        results[index]["enrolled"] = len(outcome)
+        
+        items = [
+            {"index": index, "ref": entity.ref, "entityType": entity.entityType, **result}
+            for index, (entity, result) in enumerate(zip(entities, results))
+        ]
+        created = sum(1 for item in items if item["success"])
+        return {
+            "success": created == len(items),
+            "created": created,
+            "failed": len(items) - created,
+            "results": items
+        }
+        
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2,7 +2,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user
+from pagination import ListParams, conditional_page
+from serialization import json_response, model_response
+from kb_index import index_knowledge_base
 
 router = APIRouter()
 
@@ -14,11 +17,27 @@ class KnowledgeBaseCreate(BaseModel):
     tags: Optional[List[str]] = None
     status: Optional[str] = "draft"
 
+class KnowledgeBaseUpdate(BaseModel):
+    title: Optional[str] = None
+    type: Optional[str] = None
+    description: Optional[str] = None
+    content: Optional[str] = None
+    tags: Optional[List[str]] = None
+    status: Optional[str] = None
+
 class KnowledgeBaseResponse(BaseModel):
     success: bool
     knowledge_base: Optional[Dict[str, Any]] = None
+    chunk_count: Optional[int] = None
     error: Optional[str] = None
 
+async def _index(supabase, knowledge_base: Dict[str, Any]) -> int:
+    """Re-chunk a knowledge base, reporting a failed reindex as such rather than as a failed save"""
+    try:
+        return await index_knowledge_base(supabase, knowledge_base)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Indexing the knowledge base content failed and its previous chunks were kept: {e}")
+
 @router.post("/create", response_model=KnowledgeBaseResponse)
 async def create_knowledge_base(
     kb_data: KnowledgeBaseCreate,
@@ -34,7 +53,7 @@ async def create_knowledge_base(
         from datetime import datetime
         now = datetime.utcnow().isoformat()
         
-        result = supabase.table("knowledge_base").insert({
+        result = await execute_query(supabase.table("knowledge_base").insert({
             "user_id": user["id"],
             "title": kb_data.title,
             "type": kb_data.type,
@@ -44,14 +63,84 @@ async def create_knowledge_base(
             "status": kb_data.status,
             "date_added": now,
             "last_modified": now
-        }).select().single().execute()
+        }))
+        
+        # Split content into retrieval chunks
+        chunk_count = await _index(supabase, result.data[0])
         
-        return KnowledgeBaseResponse(success=True, knowledge_base=result.data)
+        return model_response(KnowledgeBaseResponse, success=True, knowledge_base=result.data[0], chunk_count=chunk_count)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/{knowledge_base_id}", response_model=KnowledgeBaseResponse)
+async def update_knowledge_base(
+    knowledge_base_id: str,
+    kb_data: KnowledgeBaseUpdate,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        from datetime import datetime
+        now = datetime.utcnow().isoformat()
+        
+        changes = kb_data.model_dump(exclude_unset=True)
+        result = await execute_query(supabase.table("knowledge_base").update({
+            **changes,
+            "last_modified": now,
+            "updated_at": now
+        }).eq("id", knowledge_base_id).eq("user_id", user["id"]))
+        
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Knowledge base not found")
+        
+        # Re-chunk only when the content changed
+        chunk_count = await _index(supabase, result.data[0]) if "content" in changes else None
+        
+        return model_response(KnowledgeBaseResponse, success=True, knowledge_base=result.data[0], chunk_count=chunk_count)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{knowledge_base_id}/reindex", response_model=KnowledgeBaseResponse)
+async def reindex_knowledge_base(
+    knowledge_base_id: str,
+    authorization: str = Header(..., alias="Authorization")
+):
+    supabase = get_supabase_client()
+    user = await authenticate_user(authorization, supabase)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        result = await execute_query(
+            supabase.table("knowledge_base").select("id, user_id, content").eq("id", knowledge_base_id).eq("user_id", user["id"]).limit(1)
+        )
+        
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Knowledge base not found")
+        
+        chunk_count = await _index(supabase, result.data[0])
+        return model_response(KnowledgeBaseResponse, success=True, chunk_count=chunk_count)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/list")
-async def list_knowledge_base(authorization: str = Header(..., alias="Authorization")):
+async def list_knowledge_base(
+    authorization: str = Header(..., alias="Authorization"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -59,7 +148,16 @@ async def list_knowledge_base(authorization: str = Header(..., alias="Authorizat
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("knowledge_base").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return {"success": True, "knowledge_base": result.data}
+        return await conditional_page(
+            supabase, "knowledge_base", user["id"], params, if_none_match,
+            lambda page: json_response({
+                "success": True,
+                "knowledge_base": page["rows"],
+                "next_cursor": page["next_cursor"],
+                "total_count": page["total_count"]
+            })
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2,7 +2,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user
+from pagination import ListParams, conditional_page
+from serialization import model_response
 
 router = APIRouter()
 
@@ -17,6 +19,8 @@ class ScriptResponse(BaseModel):
     success: bool
     script: Optional[Dict[str, Any]] = None
     scripts: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
     error: Optional[str] = None
 
 @router.post("/create", response_model=ScriptResponse)
@@ -31,21 +35,25 @@ async def create_script(
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("scripts").insert({
+        result = await execute_query(supabase.table("scripts").insert({
             "user_id": user["id"],
             "name": script_data.name,
             "description": script_data.description,
             "company": script_data.company,
             "first_message": script_data.first_message,
             "sections": script_data.sections
-        }).select().single().execute()
+        }))
         
-        return ScriptResponse(success=True, script=result.data)
+        return model_response(ScriptResponse, success=True, script=result.data[0])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/list", response_model=ScriptResponse)
-async def list_scripts(authorization: str = Header(..., alias="Authorization")):
+async def list_scripts(
+    authorization: str = Header(..., alias="Authorization"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -53,11 +61,19 @@ async def list_scripts(authorization: str = Header(..., alias="Authorization")):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("scripts").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return ScriptResponse(success=True, scripts=result.data)
+        return await conditional_page(
+            supabase, "scripts", user["id"], params, if_none_match,
+            lambda page: model_response(ScriptResponse, success=True, scripts=page["rows"], next_cursor=page["next_cursor"], total_count=page["total_count"])
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/user-scripts", response_model=ScriptResponse)
-async def get_user_scripts(authorization: str = Header(..., alias="Authorization")):
-    return await list_scripts(authorization)
+async def get_user_scripts(
+    authorization: str = Header(..., alias="Authorization"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    params: ListParams = Depends()
+):
+    return await list_scripts(authorization, if_none_match, params)
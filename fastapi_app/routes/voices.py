@@ -2,7 +2,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
-from database import get_supabase_client, authenticate_user
+from database import get_supabase_client, execute_query, authenticate_user
+from pagination import ListParams, conditional_page, VOICES_LIST_CACHE_MAX_AGE_SECONDS
+from serialization import model_response
 
 router = APIRouter()
 
@@ -14,6 +16,8 @@ class VoiceResponse(BaseModel):
     success: bool
     voice: Optional[Dict[str, Any]] = None
     voices: Optional[List[Dict[str, Any]]] = None
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
     error: Optional[str] = None
 
 @router.post("/create", response_model=VoiceResponse)
@@ -28,18 +32,22 @@ async def create_voice(
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("custom_voices").insert({
+        result = await execute_query(supabase.table("custom_voices").insert({
             "user_id": user["id"],
             "voice_name": voice_data.voice_name,
             "voice_id": voice_data.voice_id
-        }).select().single().execute()
+        }))
         
-        return VoiceResponse(success=True, voice=result.data)
+        return model_response(VoiceResponse, success=True, voice=result.data[0])
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/list", response_model=VoiceResponse)
-async def list_voices(authorization: str = Header(..., alias="Authorization")):
+async def list_voices(
+    authorization: str = Header(..., alias="Authorization"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    params: ListParams = Depends()
+):
     supabase = get_supabase_client()
     user = await authenticate_user(authorization, supabase)
     
@@ -47,7 +55,12 @@ async def list_voices(authorization: str = Header(..., alias="Authorization")):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        result = supabase.table("custom_voices").select("*").eq("user_id", user["id"]).order("created_at", desc=True).execute()
-        return VoiceResponse(success=True, voices=result.data)
+        return await conditional_page(
+            supabase, "custom_voices", user["id"], params, if_none_match,
+            lambda page: model_response(VoiceResponse, success=True, voices=page["rows"], next_cursor=page["next_cursor"], total_count=page["total_count"]),
+            max_age=VOICES_LIST_CACHE_MAX_AGE_SECONDS
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,20 @@
+
+from typing import Any, Dict, Optional, Type
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson serializes large lists of rows several times faster than the json module
+JSONResponseClass = ORJSONResponse if orjson else JSONResponse
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serialize trusted content directly, skipping FastAPI's jsonable_encoder and response_model passes"""
+    return JSONResponseClass(content, status_code=status_code, headers=headers)
+
+def model_response(model: Type[BaseModel], **fields: Any) -> Response:
+    """Response shaped like `model` built from database rows without validating them again"""
+    return json_response({name: fields.get(name, field.default) for name, field in model.model_fields.items()})
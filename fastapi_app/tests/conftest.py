@@ -0,0 +1,20 @@
+
+import os
+import sys
+
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import database
+from fake_postgrest import FakePostgrest
+
+@pytest.fixture
+def fake():
+    """Supabase clients backed by an in-memory FakePostgrest"""
+    fake = FakePostgrest()
+    database.close_supabase_clients()
+    database._transport = fake.transport()
+    yield fake
+    database._clients.clear()
+    database._transport = None
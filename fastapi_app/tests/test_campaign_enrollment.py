@@ -0,0 +1,29 @@
+
+import asyncio
+from database import get_supabase_client
+from campaign_enrollment import enroll_contact_ids, run_enrollment
+
+def test_enroll_contact_ids_counts_only_new_members(fake):
+    supabase = get_supabase_client(use_service_role=True)
+    fake.insert("campaign_contacts", [{"campaign_id": "campaign", "contact_id": "c1"}])
+    
+    assert asyncio.run(enroll_contact_ids(supabase, "campaign", ["c1", "c2", "c2", "c3"])) == 2
+    assert sorted(row["contact_id"] for row in fake.tables["campaign_contacts"]) == ["c1", "c2", "c3"]
+
+def test_filter_enrollment_progress_skips_existing_members(fake):
+    supabase = get_supabase_client(use_service_role=True)
+    fake.insert("contacts", [{"id": f"c{n}", "user_id": "u1", "city": "Pune"} for n in range(5)])
+    fake.insert("campaign_contacts", [{"campaign_id": "campaign", "contact_id": "c0"}, {"campaign_id": "campaign", "contact_id": "c3"}])
+    enrollment = fake.insert("campaign_enrollments", [{
+        "campaign_id": "campaign", "user_id": "u1", "contact_filter": {"city": "Pune"},
+        "status": "pending", "enrolled_count": 0, "last_contact_id": None
+    }])[0]
+    
+    async def run():
+        return [progress async for progress in run_enrollment(supabase, enrollment)]
+    
+    progress = asyncio.run(run())
+    assert progress[-1]["status"] == "completed"
+    assert progress[-1]["enrolled_count"] == 3
+    assert enrollment["enrolled_count"] == 3
+    assert len(fake.tables["campaign_contacts"]) == 5
@@ -0,0 +1,56 @@
+
+import asyncio
+from database import get_supabase_client
+from dial_queue import DIAL_QUEUE_MAX_ATTEMPTS, complete_dial_lease, reschedule_campaign_contacts
+
+EXPIRED = "2000-01-01T00:00:00"
+LIVE = "2100-01-01T00:00:00"
+CALLBACK_AT = "2099-01-01T00:00:00"
+
+def _membership(fake, contact_id, **columns):
+    row = {
+        "campaign_id": "campaign", "contact_id": contact_id, "dial_status": "queued", "attempts": 1,
+        "next_dial_at": EXPIRED, "lease_token": None, "leased_by": None, "leased_until": None, **columns
+    }
+    return fake.insert("campaign_contacts", [row])[0]
+
+def _leased(fake, contact_id, attempts, leased_until=LIVE):
+    return _membership(
+        fake, contact_id, dial_status="leased", attempts=attempts,
+        lease_token=f"token-{contact_id}", leased_by="worker", leased_until=leased_until
+    )
+
+def test_complete_with_callback_requeues_until_attempts_run_out(fake):
+    supabase = get_supabase_client(use_service_role=True)
+    retry = _leased(fake, "retry", attempts=DIAL_QUEUE_MAX_ATTEMPTS - 1)
+    last = _leased(fake, "last", attempts=DIAL_QUEUE_MAX_ATTEMPTS)
+    
+    requeued = asyncio.run(complete_dial_lease(supabase, retry["id"], retry["lease_token"], "retry", CALLBACK_AT))
+    exhausted = asyncio.run(complete_dial_lease(supabase, last["id"], last["lease_token"], "retry", CALLBACK_AT))
+    
+    assert requeued["dial_status"] == "queued"
+    assert requeued["next_dial_at"] == CALLBACK_AT
+    assert exhausted["dial_status"] == "failed"
+    assert exhausted["lease_token"] is None
+
+def test_reschedule_skips_finished_memberships_and_live_leases(fake):
+    supabase = get_supabase_client(use_service_role=True)
+    rows = {
+        "queued": _membership(fake, "queued"),
+        "expired": _leased(fake, "expired", attempts=1, leased_until=EXPIRED),
+        "live": _leased(fake, "live", attempts=1),
+        "completed": _membership(fake, "completed", dial_status="completed"),
+        "failed": _membership(fake, "failed", dial_status="failed"),
+        "exhausted": _leased(fake, "exhausted", attempts=DIAL_QUEUE_MAX_ATTEMPTS, leased_until=EXPIRED)
+    }
+    
+    asyncio.run(reschedule_campaign_contacts(supabase, [
+        {"campaign_id": "campaign", "contact_id": contact_id, "rescheduled_for": CALLBACK_AT} for contact_id in rows
+    ]))
+    
+    assert rows["queued"]["dial_status"] == "queued" and rows["queued"]["next_dial_at"] == CALLBACK_AT
+    assert rows["expired"]["dial_status"] == "queued" and rows["expired"]["lease_token"] is None
+    assert rows["live"]["dial_status"] == "leased" and rows["live"]["lease_token"] == "token-live"
+    assert rows["completed"]["dial_status"] == "completed"
+    assert rows["failed"]["dial_status"] == "failed"
+    assert rows["exhausted"]["dial_status"] == "failed" and rows["exhausted"]["lease_token"] is None
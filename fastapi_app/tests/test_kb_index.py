@@ -0,0 +1,31 @@
+
+import asyncio
+import pytest
+from database import get_supabase_client
+from kb_index import index_knowledge_base
+
+KNOWLEDGE_BASE = {"id": "kb", "user_id": "u1"}
+
+def _chunks(fake):
+    rows = [row for row in fake.tables.get("knowledge_base_chunks", []) if row["knowledge_base_id"] == "kb"]
+    return [row["content"] for row in sorted(rows, key=lambda row: row["chunk_index"])]
+
+def test_reindex_replaces_all_chunks(fake):
+    supabase = get_supabase_client(use_service_role=True)
+    long_content = "\n\n".join(" ".join(f"word{n}" for n in range(150)) for _ in range(3))
+    
+    assert asyncio.run(index_knowledge_base(supabase, {**KNOWLEDGE_BASE, "content": long_content})) == 3
+    assert asyncio.run(index_knowledge_base(supabase, {**KNOWLEDGE_BASE, "content": "Returns within 30 days."})) == 1
+    assert _chunks(fake) == ["Returns within 30 days."]
+
+def test_failed_reindex_keeps_previous_chunks(fake, monkeypatch):
+    supabase = get_supabase_client(use_service_role=True)
+    asyncio.run(index_knowledge_base(supabase, {**KNOWLEDGE_BASE, "content": "Returns within 30 days."}))
+    
+    def fail(**params):
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(fake, "_rpc_replace_knowledge_base_chunks", fail)
+    
+    with pytest.raises(Exception):
+        asyncio.run(index_knowledge_base(supabase, {**KNOWLEDGE_BASE, "content": "Shipping is free."}))
+    assert _chunks(fake) == ["Returns within 30 days."]
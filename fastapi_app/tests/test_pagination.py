@@ -0,0 +1,38 @@
+
+import base64
+import json
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import main
+from pagination import encode_cursor, decode_cursor
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def test_cursor_round_trip():
+    row = {"created_at": "2026-10-17T12:00:00.123456+00:00", "id": "6f1c2a9e-8a8e-4c1b-9a53-0d6f0f4f6b0e"}
+    assert decode_cursor(encode_cursor(row)) == (row["created_at"], row["id"])
+
+@pytest.mark.parametrize("payload", [
+    ['2026-10-17T12:00:00+00:00",id.gt.(', "6f1c2a9e-8a8e-4c1b-9a53-0d6f0f4f6b0e"],
+    ["2026-10-17T12:00:00+00:00", 'x"),or(id.neq.0'],
+    ["yesterday", "6f1c2a9e-8a8e-4c1b-9a53-0d6f0f4f6b0e"],
+    [1, 2],
+    {"created_at": "2026-10-17T12:00:00+00:00"}
+])
+def test_tampered_cursor_is_rejected(payload):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(_cursor(payload))
+    assert error.value.status_code == 400
+
+def test_tampered_cursor_returns_400(fake):
+    fake.insert("user_settings", [{"user_id": "u1", "setting_key": "api_key", "setting_value": "dhwani_test"}])
+    with TestClient(main.app) as client:
+        response = client.get(
+            "/contacts/list",
+            params={"cursor": _cursor(["2026-10-17T12:00:00+00:00", 'x")'])},
+            headers={"Authorization": "Bearer dhwani_test"}
+        )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
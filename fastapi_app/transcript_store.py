@@ -0,0 +1,145 @@
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import zlib
+from typing import Optional, List, Dict, Any, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from database import get_supabase_client, run_blocking
+
+# Where call transcripts are kept outside the calls table: "local", "supabase", or "" to keep them inline
+TRANSCRIPT_STORE = os.getenv("TRANSCRIPT_STORE", "")
+TRANSCRIPT_STORE_DIR = os.getenv("TRANSCRIPT_STORE_DIR", "transcript_blobs")
+TRANSCRIPT_STORE_BUCKET = os.getenv("TRANSCRIPT_STORE_BUCKET", "transcripts")
+# Shorter transcripts stay inline, where they cost less than a separate blob
+TRANSCRIPT_OFFLOAD_MIN_BYTES = int(os.getenv("TRANSCRIPT_OFFLOAD_MIN_BYTES", "1024"))
+TRANSCRIPT_ZSTD_LEVEL = int(os.getenv("TRANSCRIPT_ZSTD_LEVEL", "9"))
+TRANSCRIPT_ZLIB_LEVEL = int(os.getenv("TRANSCRIPT_ZLIB_LEVEL", "6"))
+
+# zstd when the zstandard package is installed; blobs record their codec, so both remain readable
+TRANSCRIPT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+# Decompressed bytes per streamed chunk
+_CHUNK_SIZE = 64 * 1024
+
+class LocalBlobStore:
+    """Blobs as files under a directory; for tests and single-host deployments"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+    
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a unique temporary name so readers never see a partial blob and concurrent
+        # writers of the same blob, in this process or another, do not share a file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # Content-addressed: if another writer stored the blob first, it holds the same bytes
+            if not os.path.exists(path):
+                raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+class SupabaseBlobStore:
+    """Blobs in a Supabase Storage bucket"""
+    
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+    
+    def put(self, key: str, data: bytes) -> None:
+        # Keys are content addresses, so overwriting an existing blob writes identical bytes
+        get_supabase_client(use_service_role=True).storage.from_(self.bucket).upload(
+            key, data, {"content-type": "application/octet-stream", "upsert": "true"}
+        )
+    
+    def get(self, key: str) -> bytes:
+        return get_supabase_client(use_service_role=True).storage.from_(self.bucket).download(key)
+
+def _create_store():
+    if TRANSCRIPT_STORE == "local":
+        return LocalBlobStore(TRANSCRIPT_STORE_DIR)
+    if TRANSCRIPT_STORE == "supabase":
+        return SupabaseBlobStore(TRANSCRIPT_STORE_BUCKET)
+    return None
+
+blob_store = _create_store()
+
+def _compress(data: bytes) -> bytes:
+    if TRANSCRIPT_CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=TRANSCRIPT_ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, TRANSCRIPT_ZLIB_LEVEL)
+
+def _decompress(codec: str, blob: bytes) -> Iterator[bytes]:
+    """Decompressed blob in chunks of at most _CHUNK_SIZE bytes"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Transcript is zstd-compressed but the zstandard package is not installed")
+        yield from zstandard.ZstdDecompressor().read_to_iter(blob, write_size=_CHUNK_SIZE)
+        return
+    
+    decompressor = zlib.decompressobj()
+    data = blob
+    while data:
+        yield decompressor.decompress(data, _CHUNK_SIZE)
+        data = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+def offload_transcript(transcript: Optional[str]) -> Dict[str, Any]:
+    """calls columns for a transcript, writing it to the blob store when it is long enough to move out of the row"""
+    if transcript is None:
+        return {"transcript": None, "transcript_ref": None, "transcript_bytes": None}
+    
+    data = transcript.encode()
+    if blob_store is None or len(data) < TRANSCRIPT_OFFLOAD_MIN_BYTES:
+        return {"transcript": transcript, "transcript_ref": None, "transcript_bytes": len(data)}
+    
+    # Content-addressed by the text, so retried ingests and repeated transcripts share one blob
+    ref = f"{TRANSCRIPT_CODEC}/{hashlib.sha256(data).hexdigest()}"
+    blob_store.put(ref, _compress(data))
+    return {"transcript": None, "transcript_ref": ref, "transcript_bytes": len(data)}
+
+async def store_transcripts(transcripts: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """offload_transcript for a batch of calls, writing their blobs concurrently"""
+    if blob_store is None:
+        return [offload_transcript(transcript) for transcript in transcripts]
+    return await asyncio.gather(*(run_blocking(offload_transcript, transcript) for transcript in transcripts))
+
+async def load_transcript_blob(ref: str) -> bytes:
+    if blob_store is None:
+        raise RuntimeError("Transcript is in the blob store but TRANSCRIPT_STORE is not configured")
+    return await run_blocking(blob_store.get, ref)
+
+def iter_transcript_range(ref: str, blob: bytes, start: int, end: int) -> Iterator[bytes]:
+    """Bytes start..end (inclusive) of a stored transcript, decompressed lazily"""
+    codec = ref.split("/", 1)[0]
+    offset = 0
+    for chunk in _decompress(codec, blob):
+        if not chunk:
+            continue
+        chunk_end = offset + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - offset, 0):end + 1 - offset]
+        if chunk_end > end:
+            return
+        offset = chunk_end
@@ -0,0 +1,27 @@
+
+-- Add a normalized phone column so callers can be found with a keyed lookup
+ALTER TABLE public.contacts
+ADD COLUMN IF NOT EXISTS phone_normalized text;
+
+COMMENT ON COLUMN public.contacts.phone_normalized IS 'Phone number with spaces, dashes, dots and parentheses removed (same rules as normalize_phone_number in the API)';
+
+-- Keep the column in sync for writes that do not go through the API (e.g. the dashboard)
+CREATE OR REPLACE FUNCTION public.set_contact_phone_normalized()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.phone_normalized := NULLIF(translate(NEW.phone, ' -().', ''), '');
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS contacts_set_phone_normalized ON public.contacts;
+CREATE TRIGGER contacts_set_phone_normalized
+  BEFORE INSERT OR UPDATE OF phone ON public.contacts
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_contact_phone_normalized();
+
+-- Index for caller lookups; existing rows are backfilled in batches with
+-- fastapi_app/backfill_phone_index.py to avoid one long table rewrite
+CREATE INDEX IF NOT EXISTS idx_contacts_phone_normalized ON public.contacts(phone_normalized);
@@ -0,0 +1,4 @@
+
+-- Extracted-data exports page through a campaign's calls in id order
+CREATE INDEX IF NOT EXISTS idx_calls_campaign_id_id ON public.calls(campaign_id, id)
+  WHERE extracted_data IS NOT NULL;
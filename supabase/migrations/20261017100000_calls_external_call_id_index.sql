@@ -0,0 +1,4 @@
+
+-- Queue worker checks which external call ids are already stored before inserting
+CREATE INDEX IF NOT EXISTS idx_calls_external_call_id ON public.calls(external_call_id)
+  WHERE external_call_id IS NOT NULL;
@@ -0,0 +1,36 @@
+
+-- Keep updated_at current on the rows that make up a campaign call context, so
+-- the API's context snapshots notice edits made outside the API (e.g. the dashboard)
+CREATE OR REPLACE FUNCTION public.set_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at := now();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS campaigns_set_updated_at ON public.campaigns;
+CREATE TRIGGER campaigns_set_updated_at
+  BEFORE UPDATE ON public.campaigns
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
+
+DROP TRIGGER IF EXISTS agents_set_updated_at ON public.agents;
+CREATE TRIGGER agents_set_updated_at
+  BEFORE UPDATE ON public.agents
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
+
+DROP TRIGGER IF EXISTS scripts_set_updated_at ON public.scripts;
+CREATE TRIGGER scripts_set_updated_at
+  BEFORE UPDATE ON public.scripts
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
+
+DROP TRIGGER IF EXISTS knowledge_base_set_updated_at ON public.knowledge_base;
+CREATE TRIGGER knowledge_base_set_updated_at
+  BEFORE UPDATE ON public.knowledge_base
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
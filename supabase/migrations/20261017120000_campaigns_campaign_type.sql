@@ -0,0 +1,32 @@
+
+-- Promote settings->>'campaign_type' to a column so the active campaign of a
+-- given type can be resolved with one indexed lookup
+ALTER TABLE public.campaigns
+ADD COLUMN IF NOT EXISTS campaign_type text;
+
+COMMENT ON COLUMN public.campaigns.campaign_type IS 'Copy of settings->>''campaign_type'' (e.g. inbound, outbound), maintained by trigger';
+
+UPDATE public.campaigns
+SET campaign_type = settings->>'campaign_type'
+WHERE campaign_type IS DISTINCT FROM settings->>'campaign_type';
+
+-- Keep the column in sync with settings for every write path
+CREATE OR REPLACE FUNCTION public.set_campaign_type()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.campaign_type := NEW.settings->>'campaign_type';
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS campaigns_set_campaign_type ON public.campaigns;
+CREATE TRIGGER campaigns_set_campaign_type
+  BEFORE INSERT OR UPDATE OF settings ON public.campaigns
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_campaign_type();
+
+-- Resolver lookup: a user's active campaigns of one type, newest first
+CREATE INDEX IF NOT EXISTS idx_campaigns_active_type ON public.campaigns(user_id, campaign_type, created_at DESC, id DESC)
+  WHERE status = 'active';
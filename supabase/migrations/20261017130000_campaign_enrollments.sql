@@ -0,0 +1,50 @@
+
+-- Enrollment writes campaign_contacts in idempotent chunks, so a retried or
+-- resumed chunk must not create duplicate rows
+DELETE FROM public.campaign_contacts a
+USING public.campaign_contacts b
+WHERE a.campaign_id = b.campaign_id
+  AND a.contact_id = b.contact_id
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_campaign_contacts_campaign_contact ON public.campaign_contacts(campaign_id, contact_id);
+
+-- Progress of enrolling contacts that match a filter, so an interrupted run can resume
+CREATE TABLE IF NOT EXISTS public.campaign_enrollments (
+  id UUID NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+  campaign_id UUID NOT NULL REFERENCES public.campaigns(id) ON DELETE CASCADE,
+  user_id UUID REFERENCES auth.users NOT NULL,
+  contact_filter JSONB NOT NULL DEFAULT '{}'::jsonb,
+  status TEXT NOT NULL DEFAULT 'pending',
+  enrolled_count INTEGER NOT NULL DEFAULT 0,
+  last_contact_id UUID,
+  error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_campaign_enrollments_campaign_id ON public.campaign_enrollments(campaign_id);
+
+-- Add Row Level Security (RLS)
+ALTER TABLE public.campaign_enrollments ENABLE ROW LEVEL SECURITY;
+
+-- Create policy that allows users to view their own enrollments
+CREATE POLICY "Users can view their own enrollments"
+  ON public.campaign_enrollments
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Create policy that allows users to create their own enrollments
+CREATE POLICY "Users can create their own enrollments"
+  ON public.campaign_enrollments
+  FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+-- Create policy that allows users to update their own enrollments
+CREATE POLICY "Users can update their own enrollments"
+  ON public.campaign_enrollments
+  FOR UPDATE
+  USING (auth.uid() = user_id);
+
+-- Filter enrollment walks a user's contacts in id order
+CREATE INDEX IF NOT EXISTS idx_contacts_user_id_id ON public.contacts(user_id, id);
@@ -0,0 +1,106 @@
+
+-- Dial queue state on campaign memberships: dialer workers lease contacts to call
+ALTER TABLE public.campaign_contacts
+ADD COLUMN IF NOT EXISTS dial_status text NOT NULL DEFAULT 'queued',
+ADD COLUMN IF NOT EXISTS next_dial_at timestamp with time zone NOT NULL DEFAULT now(),
+ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS lease_token uuid,
+ADD COLUMN IF NOT EXISTS leased_by text,
+ADD COLUMN IF NOT EXISTS leased_until timestamp with time zone,
+ADD COLUMN IF NOT EXISTS last_dialed_at timestamp with time zone;
+
+COMMENT ON COLUMN public.campaign_contacts.dial_status IS 'queued, leased, completed or failed';
+
+-- Optional cap on contacts leased at the same time for a campaign
+ALTER TABLE public.campaigns
+ADD COLUMN IF NOT EXISTS max_concurrent_calls integer;
+
+-- Claims scan due queued rows and expired leases of one campaign
+CREATE INDEX IF NOT EXISTS idx_campaign_contacts_dial_due ON public.campaign_contacts(campaign_id, next_dial_at, id)
+  WHERE dial_status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_campaign_contacts_dial_leased ON public.campaign_contacts(campaign_id, leased_until)
+  WHERE dial_status = 'leased';
+
+-- Lease up to p_limit due contacts of an active campaign. Rows locked by a
+-- concurrent claim are skipped rather than waited on, and the per-campaign
+-- concurrency cap is checked under a transaction-scoped advisory lock.
+CREATE OR REPLACE FUNCTION public.claim_dial_leases(
+  p_campaign_id uuid,
+  p_worker text,
+  p_limit integer,
+  p_lease_seconds integer,
+  p_default_max_concurrent integer DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  campaign_id uuid,
+  contact_id uuid,
+  lease_token uuid,
+  leased_until timestamp with time zone,
+  attempts integer,
+  phone text,
+  name text
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_cap integer;
+  v_active integer;
+  v_available integer;
+BEGIN
+  SELECT COALESCE(c.max_concurrent_calls, p_default_max_concurrent)
+  INTO v_cap
+  FROM public.campaigns c
+  WHERE c.id = p_campaign_id AND c.status = 'active';
+
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  v_available := p_limit;
+  IF v_cap IS NOT NULL AND v_cap > 0 THEN
+    PERFORM pg_advisory_xact_lock(hashtext('claim_dial_leases:' || p_campaign_id::text));
+
+    SELECT count(*) INTO v_active
+    FROM public.campaign_contacts cc
+    WHERE cc.campaign_id = p_campaign_id
+      AND cc.dial_status = 'leased'
+      AND cc.leased_until > now();
+
+    v_available := LEAST(p_limit, v_cap - v_active);
+  END IF;
+
+  IF v_available <= 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  WITH picked AS (
+    SELECT cc.id
+    FROM public.campaign_contacts cc
+    WHERE cc.campaign_id = p_campaign_id
+      AND (
+        (cc.dial_status = 'queued' AND cc.next_dial_at <= now())
+        OR (cc.dial_status = 'leased' AND cc.leased_until <= now())
+      )
+    ORDER BY cc.next_dial_at, cc.id
+    LIMIT v_available
+    FOR UPDATE SKIP LOCKED
+  ),
+  leased AS (
+    UPDATE public.campaign_contacts cc
+    SET dial_status = 'leased',
+        lease_token = gen_random_uuid(),
+        leased_by = p_worker,
+        leased_until = now() + make_interval(secs => p_lease_seconds),
+        last_dialed_at = now(),
+        attempts = cc.attempts + 1
+    FROM picked
+    WHERE cc.id = picked.id
+    RETURNING cc.id, cc.campaign_id, cc.contact_id, cc.lease_token, cc.leased_until, cc.attempts
+  )
+  SELECT leased.id, leased.campaign_id, leased.contact_id, leased.lease_token, leased.leased_until, leased.attempts, ct.phone, ct.name
+  FROM leased
+  JOIN public.contacts ct ON ct.id = leased.contact_id;
+END;
+$$;
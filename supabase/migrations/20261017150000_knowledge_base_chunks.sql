@@ -0,0 +1,33 @@
+
+-- Retrieval chunks of knowledge base content, written by the API on create/update
+CREATE TABLE IF NOT EXISTS public.knowledge_base_chunks (
+  id UUID NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+  knowledge_base_id UUID NOT NULL REFERENCES public.knowledge_base(id) ON DELETE CASCADE,
+  user_id UUID REFERENCES auth.users NOT NULL,
+  chunk_index INTEGER NOT NULL,
+  content TEXT NOT NULL,
+  token_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  UNIQUE(knowledge_base_id, chunk_index)
+);
+
+-- Add Row Level Security (RLS)
+ALTER TABLE public.knowledge_base_chunks ENABLE ROW LEVEL SECURITY;
+
+-- Create policy that allows users to view their own chunks
+CREATE POLICY "Users can view their own knowledge base chunks"
+  ON public.knowledge_base_chunks
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Create policy that allows users to create their own chunks
+CREATE POLICY "Users can create their own knowledge base chunks"
+  ON public.knowledge_base_chunks
+  FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+-- Create policy that allows users to delete their own chunks
+CREATE POLICY "Users can delete their own knowledge base chunks"
+  ON public.knowledge_base_chunks
+  FOR DELETE
+  USING (auth.uid() = user_id);
@@ -0,0 +1,21 @@
+
+-- /list endpoints answer conditional GETs from the row count and newest updated_at
+-- of a user's rows, so that pair must be cheap to read and updated_at must move on
+-- every edit, including edits made outside the API
+DROP TRIGGER IF EXISTS custom_voices_set_updated_at ON public.custom_voices;
+CREATE TRIGGER custom_voices_set_updated_at
+  BEFORE UPDATE ON public.custom_voices
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_agents_user_id_updated_at
+  ON public.agents (user_id, updated_at DESC NULLS LAST);
+
+CREATE INDEX IF NOT EXISTS idx_scripts_user_id_updated_at
+  ON public.scripts (user_id, updated_at DESC NULLS LAST);
+
+CREATE INDEX IF NOT EXISTS idx_custom_voices_user_id_updated_at
+  ON public.custom_voices (user_id, updated_at DESC NULLS LAST);
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_user_id_updated_at
+  ON public.knowledge_base (user_id, updated_at DESC NULLS LAST);
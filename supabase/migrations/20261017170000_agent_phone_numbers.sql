@@ -0,0 +1,51 @@
+
+-- Phone numbers (DIDs) that route inbound calls to an agent; an agent may have several
+CREATE TABLE IF NOT EXISTS public.agent_phone_numbers (
+  id UUID NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+  agent_id UUID NOT NULL REFERENCES public.agents(id) ON DELETE CASCADE,
+  user_id UUID REFERENCES auth.users NOT NULL,
+  phone_number TEXT NOT NULL,
+  phone_normalized TEXT NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- A number routes to exactly one agent
+CREATE UNIQUE INDEX IF NOT EXISTS idx_agent_phone_numbers_phone_normalized
+  ON public.agent_phone_numbers (phone_normalized);
+
+CREATE INDEX IF NOT EXISTS idx_agent_phone_numbers_agent_id
+  ON public.agent_phone_numbers (agent_id);
+
+-- Add Row Level Security (RLS)
+ALTER TABLE public.agent_phone_numbers ENABLE ROW LEVEL SECURITY;
+
+-- Create policy that allows users to view their own agent phone numbers
+CREATE POLICY "Users can view their own agent phone numbers"
+  ON public.agent_phone_numbers
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Create policy that allows users to create their own agent phone numbers
+CREATE POLICY "Users can create their own agent phone numbers"
+  ON public.agent_phone_numbers
+  FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+-- Create policy that allows users to update their own agent phone numbers
+CREATE POLICY "Users can update their own agent phone numbers"
+  ON public.agent_phone_numbers
+  FOR UPDATE
+  USING (auth.uid() = user_id);
+
+-- Create policy that allows users to delete their own agent phone numbers
+CREATE POLICY "Users can delete their own agent phone numbers"
+  ON public.agent_phone_numbers
+  FOR DELETE
+  USING (auth.uid() = user_id);
+
+DROP TRIGGER IF EXISTS agent_phone_numbers_set_updated_at ON public.agent_phone_numbers;
+CREATE TRIGGER agent_phone_numbers_set_updated_at
+  BEFORE UPDATE ON public.agent_phone_numbers
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_updated_at();
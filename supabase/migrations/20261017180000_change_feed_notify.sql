@@ -0,0 +1,99 @@
+
+-- Row-change notifications on the row_changes channel, used by API workers to invalidate
+-- their in-memory caches. Payloads carry ids and cache keys only, never row contents.
+CREATE EXTENSION IF NOT EXISTS pgcrypto WITH SCHEMA extensions;
+
+CREATE OR REPLACE FUNCTION public.notify_row_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  changed RECORD;
+  payload JSONB;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    changed := OLD;
+  ELSE
+    changed := NEW;
+  END IF;
+
+  payload := jsonb_build_object(
+    'table', TG_TABLE_NAME,
+    'op', TG_OP,
+    'id', changed.id,
+    'user_id', changed.user_id
+  );
+
+  -- Contacts are cached by normalized phone, so a number change must drop the old key too
+  IF TG_TABLE_NAME = 'contacts' THEN
+    payload := payload || jsonb_build_object(
+      'phone_normalized', changed.phone_normalized,
+      'old_phone_normalized', CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE OLD.phone_normalized END
+    );
+  ELSIF TG_TABLE_NAME = 'agent_phone_numbers' THEN
+    payload := payload || jsonb_build_object(
+      'agent_id', changed.agent_id,
+      'old_agent_id', CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE OLD.agent_id END
+    );
+  -- API keys are cached by their SHA-256, which is all that is published
+  ELSIF TG_TABLE_NAME = 'user_settings' THEN
+    payload := payload || jsonb_build_object(
+      'setting_key', changed.setting_key,
+      'old_value_hash', CASE WHEN TG_OP = 'INSERT' OR OLD.setting_value IS NULL THEN NULL
+        ELSE encode(extensions.digest(OLD.setting_value, 'sha256'), 'hex') END
+    );
+  END IF;
+
+  PERFORM pg_notify('row_changes', payload::text);
+  RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+  table_name TEXT;
+BEGIN
+  FOREACH table_name IN ARRAY ARRAY[
+    'contacts', 'campaigns', 'agents', 'scripts', 'knowledge_base', 'agent_phone_numbers', 'user_settings'
+  ] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', table_name || '_notify_change', table_name);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON public.%I FOR EACH ROW EXECUTE FUNCTION public.notify_row_change()',
+      table_name || '_notify_change', table_name
+    );
+  END LOOP;
+END;
+$$;
+
+-- Chunks are written in bulk, so notify once per knowledge base per statement instead of per row
+CREATE OR REPLACE FUNCTION public.notify_knowledge_base_chunks_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  knowledge_base UUID;
+BEGIN
+  FOR knowledge_base IN SELECT DISTINCT knowledge_base_id FROM changed_rows LOOP
+    PERFORM pg_notify('row_changes', jsonb_build_object(
+      'table', TG_TABLE_NAME,
+      'op', TG_OP,
+      'knowledge_base_id', knowledge_base
+    )::text);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS knowledge_base_chunks_notify_insert ON public.knowledge_base_chunks;
+CREATE TRIGGER knowledge_base_chunks_notify_insert
+  AFTER INSERT ON public.knowledge_base_chunks
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.notify_knowledge_base_chunks_change();
+
+DROP TRIGGER IF EXISTS knowledge_base_chunks_notify_delete ON public.knowledge_base_chunks;
+CREATE TRIGGER knowledge_base_chunks_notify_delete
+  AFTER DELETE ON public.knowledge_base_chunks
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.notify_knowledge_base_chunks_change();
@@ -0,0 +1,227 @@
+
+-- Per campaign, agent and day rollups of calls, maintained by triggers on calls so that
+-- campaign stats are read from a few rows instead of scanning every call
+CREATE TABLE IF NOT EXISTS public.campaign_call_stats (
+  id UUID NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+  campaign_id UUID NOT NULL REFERENCES public.campaigns(id) ON DELETE CASCADE,
+  -- The campaign's agent when the calls were recorded
+  agent_id UUID,
+  day DATE NOT NULL,
+  user_id UUID REFERENCES auth.users NOT NULL,
+  calls BIGINT NOT NULL DEFAULT 0,
+  -- status / outcome -> number of calls
+  status_counts JSONB NOT NULL DEFAULT '{}',
+  outcome_counts JSONB NOT NULL DEFAULT '{}',
+  sentiment_count BIGINT NOT NULL DEFAULT 0,
+  sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  objective_known_count BIGINT NOT NULL DEFAULT 0,
+  objective_met_count BIGINT NOT NULL DEFAULT 0,
+  duration_count BIGINT NOT NULL DEFAULT 0,
+  duration_sum BIGINT NOT NULL DEFAULT 0,
+  -- Log-bucketed durations, bucket -> number of calls: bucket -1 holds 0 s and bucket k holds
+  -- (1.02^(k-1), 1.02^k] seconds, so quantiles are within 1% and sketches merge by adding counts
+  duration_sketch JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  CONSTRAINT campaign_call_stats_key UNIQUE NULLS NOT DISTINCT (campaign_id, agent_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_campaign_call_stats_user_campaign_day
+  ON public.campaign_call_stats (user_id, campaign_id, day);
+
+-- Add Row Level Security (RLS)
+ALTER TABLE public.campaign_call_stats ENABLE ROW LEVEL SECURITY;
+
+-- Create policy that allows users to view their own campaign call stats
+CREATE POLICY "Users can view their own campaign call stats"
+  ON public.campaign_call_stats
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Adds two count maps, dropping keys whose count reaches zero
+CREATE OR REPLACE FUNCTION public.merge_counts(a JSONB, b JSONB)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT coalesce(jsonb_object_agg(key, total) FILTER (WHERE total <> 0), '{}'::jsonb)
+  FROM (
+    SELECT key, sum(value::bigint) AS total
+    FROM (SELECT * FROM jsonb_each_text(a) UNION ALL SELECT * FROM jsonb_each_text(b)) entries
+    GROUP BY key
+  ) totals;
+$$;
+
+-- Upsert statement that adds the calls selected by source to the rollups. source must return
+-- sign (1 to add, -1 to remove), campaign_id, started_at, status, outcome, sentiment,
+-- objective_met and duration. It is executed in the calling function so that trigger
+-- transition tables can be used as the source.
+CREATE OR REPLACE FUNCTION public.campaign_call_stats_upsert_sql(source TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT format($sql$
+    WITH changes AS (%s),
+    scoped AS (
+      SELECT
+        c.sign,
+        c.campaign_id,
+        campaign.agent_id,
+        campaign.user_id,
+        (coalesce(c.started_at, now()) AT TIME ZONE 'UTC')::date AS day,
+        coalesce(c.status, 'unknown') AS status,
+        c.outcome,
+        c.sentiment,
+        c.objective_met,
+        c.duration,
+        CASE
+          WHEN c.duration IS NULL THEN NULL
+          WHEN c.duration <= 0 THEN -1
+          ELSE ceil(ln(c.duration) / ln(1.02))::int
+        END AS duration_bucket
+      FROM changes c
+      JOIN public.campaigns campaign ON campaign.id = c.campaign_id
+    ),
+    totals AS (
+      SELECT
+        campaign_id, agent_id, day,
+        (array_agg(user_id))[1] AS user_id,
+        sum(sign) AS calls,
+        coalesce(sum(sign) FILTER (WHERE sentiment IS NOT NULL), 0) AS sentiment_count,
+        coalesce(sum(sign * sentiment), 0) AS sentiment_sum,
+        coalesce(sum(sign) FILTER (WHERE objective_met IS NOT NULL), 0) AS objective_known_count,
+        coalesce(sum(sign) FILTER (WHERE objective_met), 0) AS objective_met_count,
+        coalesce(sum(sign) FILTER (WHERE duration IS NOT NULL), 0) AS duration_count,
+        coalesce(sum(sign * duration), 0) AS duration_sum
+      FROM scoped
+      GROUP BY campaign_id, agent_id, day
+    ),
+    counts AS (
+      SELECT campaign_id, agent_id, day, 'status' AS kind, status AS key, sum(sign) AS n
+      FROM scoped GROUP BY campaign_id, agent_id, day, status
+      UNION ALL
+      SELECT campaign_id, agent_id, day, 'outcome', outcome, sum(sign)
+      FROM scoped WHERE outcome IS NOT NULL GROUP BY campaign_id, agent_id, day, outcome
+      UNION ALL
+      SELECT campaign_id, agent_id, day, 'duration', duration_bucket::text, sum(sign)
+      FROM scoped WHERE duration_bucket IS NOT NULL GROUP BY campaign_id, agent_id, day, duration_bucket
+    ),
+    maps AS (
+      SELECT
+        campaign_id, agent_id, day,
+        coalesce(jsonb_object_agg(key, n) FILTER (WHERE kind = 'status'), '{}'::jsonb) AS status_counts,
+        coalesce(jsonb_object_agg(key, n) FILTER (WHERE kind = 'outcome'), '{}'::jsonb) AS outcome_counts,
+        coalesce(jsonb_object_agg(key, n) FILTER (WHERE kind = 'duration'), '{}'::jsonb) AS duration_sketch
+      FROM counts
+      GROUP BY campaign_id, agent_id, day
+    )
+    INSERT INTO public.campaign_call_stats AS stats (
+      campaign_id, agent_id, day, user_id, calls, status_counts, outcome_counts,
+      sentiment_count, sentiment_sum, objective_known_count, objective_met_count,
+      duration_count, duration_sum, duration_sketch, updated_at
+    )
+    SELECT
+      t.campaign_id, t.agent_id, t.day, t.user_id, t.calls, m.status_counts, m.outcome_counts,
+      t.sentiment_count, t.sentiment_sum, t.objective_known_count, t.objective_met_count,
+      t.duration_count, t.duration_sum, m.duration_sketch, now()
+    FROM totals t
+    JOIN maps m
+      ON m.campaign_id = t.campaign_id AND m.agent_id IS NOT DISTINCT FROM t.agent_id AND m.day = t.day
+    ON CONFLICT ON CONSTRAINT campaign_call_stats_key DO UPDATE SET
+      calls = stats.calls + EXCLUDED.calls,
+      status_counts = public.merge_counts(stats.status_counts, EXCLUDED.status_counts),
+      outcome_counts = public.merge_counts(stats.outcome_counts, EXCLUDED.outcome_counts),
+      sentiment_count = stats.sentiment_count + EXCLUDED.sentiment_count,
+      sentiment_sum = stats.sentiment_sum + EXCLUDED.sentiment_sum,
+      objective_known_count = stats.objective_known_count + EXCLUDED.objective_known_count,
+      objective_met_count = stats.objective_met_count + EXCLUDED.objective_met_count,
+      duration_count = stats.duration_count + EXCLUDED.duration_count,
+      duration_sum = stats.duration_sum + EXCLUDED.duration_sum,
+      duration_sketch = public.merge_counts(stats.duration_sketch, EXCLUDED.duration_sketch),
+      updated_at = now()
+  $sql$, source);
+$$;
+
+-- Applies the calls inserted, updated or deleted by one statement; runs once per statement,
+-- so a batch of ingested calls costs a single upsert
+CREATE OR REPLACE FUNCTION public.update_campaign_call_stats()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  stat_columns CONSTANT TEXT := 'campaign_id, started_at, status, outcome, sentiment, objective_met, duration';
+  changed CONSTANT TEXT :=
+    '(n.campaign_id, n.started_at, n.status, n.outcome, n.sentiment, n.objective_met, n.duration)
+     IS DISTINCT FROM (o.campaign_id, o.started_at, o.status, o.outcome, o.sentiment, o.objective_met, o.duration)';
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    EXECUTE public.campaign_call_stats_upsert_sql(
+      format('SELECT 1 AS sign, %s FROM new_calls WHERE campaign_id IS NOT NULL', stat_columns)
+    );
+  ELSIF TG_OP = 'DELETE' THEN
+    EXECUTE public.campaign_call_stats_upsert_sql(
+      format('SELECT -1 AS sign, %s FROM old_calls WHERE campaign_id IS NOT NULL', stat_columns)
+    );
+  ELSE
+    -- Only calls whose counted columns changed move between rollups
+    EXECUTE public.campaign_call_stats_upsert_sql(format(
+      'SELECT 1 AS sign, n.campaign_id, n.started_at, n.status, n.outcome, n.sentiment, n.objective_met, n.duration
+       FROM new_calls n JOIN old_calls o ON o.id = n.id WHERE n.campaign_id IS NOT NULL AND %1$s
+       UNION ALL
+       SELECT -1, o.campaign_id, o.started_at, o.status, o.outcome, o.sentiment, o.objective_met, o.duration
+       FROM old_calls o JOIN new_calls n ON n.id = o.id WHERE o.campaign_id IS NOT NULL AND %1$s',
+      changed
+    ));
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS calls_campaign_stats_insert ON public.calls;
+CREATE TRIGGER calls_campaign_stats_insert
+  AFTER INSERT ON public.calls
+  REFERENCING NEW TABLE AS new_calls
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.update_campaign_call_stats();
+
+DROP TRIGGER IF EXISTS calls_campaign_stats_update ON public.calls;
+CREATE TRIGGER calls_campaign_stats_update
+  AFTER UPDATE ON public.calls
+  REFERENCING OLD TABLE AS old_calls NEW TABLE AS new_calls
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.update_campaign_call_stats();
+
+DROP TRIGGER IF EXISTS calls_campaign_stats_delete ON public.calls;
+CREATE TRIGGER calls_campaign_stats_delete
+  AFTER DELETE ON public.calls
+  REFERENCING OLD TABLE AS old_calls
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.update_campaign_call_stats();
+
+-- Recomputes the rollups of one campaign, or of all campaigns when called without an id.
+-- Run once after applying this migration to count calls recorded before it:
+--   SELECT public.rebuild_campaign_call_stats();
+CREATE OR REPLACE FUNCTION public.rebuild_campaign_call_stats(target_campaign_id UUID DEFAULT NULL)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- Block call writes until the rebuild commits so their trigger updates are not lost or doubled
+  LOCK TABLE public.calls IN SHARE MODE;
+
+  DELETE FROM public.campaign_call_stats
+  WHERE target_campaign_id IS NULL OR campaign_id = target_campaign_id;
+
+  EXECUTE public.campaign_call_stats_upsert_sql(format(
+    'SELECT 1 AS sign, campaign_id, started_at, status, outcome, sentiment, objective_met, duration
+     FROM public.calls WHERE campaign_id IS NOT NULL AND (%L::uuid IS NULL OR campaign_id = %L::uuid)',
+    target_campaign_id, target_campaign_id
+  ));
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.rebuild_campaign_call_stats(UUID) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,9 @@
+
+-- Transcripts moved to the blob store keep only their content address and size in calls
+ALTER TABLE public.calls ADD COLUMN IF NOT EXISTS transcript_ref TEXT;
+ALTER TABLE public.calls ADD COLUMN IF NOT EXISTS transcript_bytes INTEGER;
+
+-- Private bucket used when TRANSCRIPT_STORE=supabase; only the service role reads and writes it
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('transcripts', 'transcripts', false)
+ON CONFLICT (id) DO NOTHING;
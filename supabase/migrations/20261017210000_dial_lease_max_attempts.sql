@@ -0,0 +1,99 @@
+
+-- Expired leases are re-claimed with another attempt; fail them instead once
+-- they have used the maximum number of attempts, passed in as p_max_attempts
+DROP FUNCTION IF EXISTS public.claim_dial_leases(uuid, text, integer, integer, integer);
+
+CREATE OR REPLACE FUNCTION public.claim_dial_leases(
+  p_campaign_id uuid,
+  p_worker text,
+  p_limit integer,
+  p_lease_seconds integer,
+  p_default_max_concurrent integer DEFAULT NULL,
+  p_max_attempts integer DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  campaign_id uuid,
+  contact_id uuid,
+  lease_token uuid,
+  leased_until timestamp with time zone,
+  attempts integer,
+  phone text,
+  name text
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_cap integer;
+  v_active integer;
+  v_available integer;
+BEGIN
+  SELECT COALESCE(c.max_concurrent_calls, p_default_max_concurrent)
+  INTO v_cap
+  FROM public.campaigns c
+  WHERE c.id = p_campaign_id AND c.status = 'active';
+
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  -- A lease that expired on its last allowed attempt is not dialed again
+  IF p_max_attempts IS NOT NULL THEN
+    UPDATE public.campaign_contacts cc
+    SET dial_status = 'failed',
+        lease_token = NULL,
+        leased_by = NULL,
+        leased_until = NULL
+    WHERE cc.campaign_id = p_campaign_id
+      AND cc.dial_status = 'leased'
+      AND cc.leased_until <= now()
+      AND cc.attempts >= p_max_attempts;
+  END IF;
+
+  v_available := p_limit;
+  IF v_cap IS NOT NULL AND v_cap > 0 THEN
+    PERFORM pg_advisory_xact_lock(hashtext('claim_dial_leases:' || p_campaign_id::text));
+
+    SELECT count(*) INTO v_active
+    FROM public.campaign_contacts cc
+    WHERE cc.campaign_id = p_campaign_id
+      AND cc.dial_status = 'leased'
+      AND cc.leased_until > now();
+
+    v_available := LEAST(p_limit, v_cap - v_active);
+  END IF;
+
+  IF v_available <= 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  WITH picked AS (
+    SELECT cc.id
+    FROM public.campaign_contacts cc
+    WHERE cc.campaign_id = p_campaign_id
+      AND (
+        (cc.dial_status = 'queued' AND cc.next_dial_at <= now())
+        OR (cc.dial_status = 'leased' AND cc.leased_until <= now())
+      )
+    ORDER BY cc.next_dial_at, cc.id
+    LIMIT v_available
+    FOR UPDATE SKIP LOCKED
+  ),
+  leased AS (
+    UPDATE public.campaign_contacts cc
+    SET dial_status = 'leased',
+        lease_token = gen_random_uuid(),
+        leased_by = p_worker,
+        leased_until = now() + make_interval(secs => p_lease_seconds),
+        last_dialed_at = now(),
+        attempts = cc.attempts + 1
+    FROM picked
+    WHERE cc.id = picked.id
+    RETURNING cc.id, cc.campaign_id, cc.contact_id, cc.lease_token, cc.leased_until, cc.attempts
+  )
+  SELECT leased.id, leased.campaign_id, leased.contact_id, leased.lease_token, leased.leased_until, leased.attempts, ct.phone, ct.name
+  FROM leased
+  JOIN public.contacts ct ON ct.id = leased.contact_id;
+END;
+$$;
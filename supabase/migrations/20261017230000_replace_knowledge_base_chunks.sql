@@ -0,0 +1,29 @@
+
+-- Replaces the chunks of a knowledge base in one transaction, so a failed reindex keeps the
+-- previous chunks instead of a truncated set. Concurrent reindexes of the same knowledge base
+-- are serialized by a transaction-scoped advisory lock rather than colliding on
+-- UNIQUE(knowledge_base_id, chunk_index). Runs as the caller, so the chunk RLS policies apply.
+CREATE OR REPLACE FUNCTION public.replace_knowledge_base_chunks(
+  p_knowledge_base_id uuid,
+  p_user_id uuid,
+  p_chunks jsonb
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('replace_knowledge_base_chunks:' || p_knowledge_base_id::text));
+
+  DELETE FROM public.knowledge_base_chunks
+  WHERE knowledge_base_id = p_knowledge_base_id;
+
+  INSERT INTO public.knowledge_base_chunks (knowledge_base_id, user_id, chunk_index, content, token_count)
+  SELECT p_knowledge_base_id, p_user_id, chunk.chunk_index, chunk.content, chunk.token_count
+  FROM jsonb_to_recordset(p_chunks) AS chunk(chunk_index integer, content text, token_count integer);
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;